@@ -0,0 +1,52 @@
+'''throughput of the core traversals on deep terms
+
+run with `python -m benchmarks.deep` from the repository root
+'''
+from functools import reduce
+from timeit import Timer
+import sys
+
+from lambda_calc.ast import App, Fun, LambdaExpr, Var
+from lambda_calc.core import all_beta_reductions, alpha_equiv, curry, get_env
+
+
+def church(n: int) -> LambdaExpr:
+    '''λfx.f(f(...(fx))), nested n applications deep'''
+    body: LambdaExpr = Var('x')
+    for _ in range(n):
+        body = App(Var('f'), body)
+    return Fun([Var('f'), Var('x')], body)
+
+
+def spine(n: int) -> LambdaExpr:
+    '''(λfx.fx) y y ... y, the left nested applications the parser builds'''
+    return reduce(App, [Var('y')] * n, church(1))
+
+
+def bench(name: str, fn, size: int):
+    try:
+        number, seconds = Timer(fn).autorange()
+    except RecursionError:
+        print(f'{name:<24}{size:>8}  RecursionError')
+        return
+    per_call = seconds / number
+    print(f'{name:<24}{size:>8}{per_call * 1e3:>12.3f} ms{size / per_call / 1e6:>10.2f} Mnode/s')
+
+
+def main(sizes=(1_000, 5_000, 20_000)):
+    print(f'{"operation":<24}{"depth":>8}{"time":>15}{"throughput":>17}')
+    for n in sizes:
+        e, e2, s = church(n), church(n), spine(n)
+        bench('str', lambda: str(e), n)
+        bench('terse', lambda: f'{e:terse}', n)
+        bench('hash', lambda: hash(e), n)
+        bench('==', lambda: e == e2, n)
+        bench('get_env', lambda: get_env(e), n)
+        bench('curry', lambda: curry(e), n)
+        # fresh copies so the cached de Bruijn forms are not reused
+        bench('alpha_equiv', lambda: alpha_equiv(church(n), church(n)), n)
+        bench('all_beta_reductions', lambda: list(all_beta_reductions(s)), n)
+
+
+if __name__ == '__main__':
+    main(tuple(map(int, sys.argv[1:])) or (1_000, 5_000, 20_000))
@@ -0,0 +1,53 @@
+'''memory per node and cost of hashing, comparing and building terms
+
+run with `python -m benchmarks.nodes` from the repository root
+'''
+from timeit import Timer
+import sys
+import tracemalloc
+
+from benchmarks.deep import church, spine
+from lambda_calc.ast import LambdaExpr, free_names, walk
+
+
+def nodes(expr: LambdaExpr) -> int:
+    return sum(1 for _ in walk(expr))
+
+
+def memory(build, n: int) -> float:
+    '''bytes allocated per node while building a term'''
+    tracemalloc.start()
+    expr = build(n)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / nodes(expr)
+
+
+def cached(n: int) -> LambdaExpr:
+    expr = church(n)
+    free_names(expr)
+    return expr
+
+
+def bench(name: str, fn, size: int):
+    number, seconds = Timer(fn).autorange()
+    print(f'{name:<24}{size:>8}{seconds / number * 1e6:>14.2f} us')
+
+
+def main(sizes=(1_000, 10_000)):
+    for n in sizes:
+        print(f'{"church":<24}{n:>8}{memory(church, n):>11.1f} B/node')
+        print(f'{"spine":<24}{n:>8}{memory(spine, n):>11.1f} B/node')
+        # with the free names cached on every node, as after a reduction
+        print(f'{"church, free_names":<24}{n:>8}{memory(cached, n):>11.1f} B/node')
+    for n in sizes:
+        e, e2, e3 = church(n), church(n), church(n - 1)
+        bench('build', lambda: church(n), n)
+        bench('hash', lambda: hash(e), n)
+        bench('== equal', lambda: e == e2, n)
+        bench('== different', lambda: e == e3, n)
+        bench('set of subterms', lambda: len({node for node, _ in walk(e)}), n)
+
+
+if __name__ == '__main__':
+    main(tuple(map(int, sys.argv[1:])) or (1_000, 10_000))
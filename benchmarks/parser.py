@@ -0,0 +1,46 @@
+'''the hand written parser against the parsy grammar on long inputs
+
+run with `python -m benchmarks.parser` from the repository root
+'''
+from timeit import Timer
+import sys
+
+from lambda_calc.parser import parse, parse_combinator
+
+
+def church(n: int) -> str:
+    '''λfx.f(f(...(fx))), nested n parentheses deep'''
+    return 'λfx.' + 'f(' * n + 'x' + ')' * n
+
+
+def wide(n: int) -> str:
+    '''x x ... x, n applications on one spine'''
+    return ' '.join(['x'] * n)
+
+
+def lines(n: int) -> str:
+    '''n short candidate lines, as a submission spans them'''
+    return '\n'.join(['(λx y.y x)(λz.z)(a b)'] * n)
+
+
+def bench(name: str, fn, size: int) -> float | None:
+    try:
+        number, seconds = Timer(fn).autorange()
+    except RecursionError:
+        print(f'{name:<24}{size:>8}  RecursionError')
+        return None
+    per_call = seconds / number
+    print(f'{name:<24}{size:>8}{per_call * 1e3:>12.3f} ms')
+    return per_call
+
+
+def main(sizes=(100, 1_000, 10_000)):
+    print(f'{"input":<24}{"size":>8}{"time":>15}')
+    for n in sizes:
+        for name, text in [('church', church(n)), ('wide', wide(n)), ('lines', lines(n))]:
+            bench(f'{name} parse', lambda: parse(text), n)
+            bench(f'{name} parse_combinator', lambda: parse_combinator(text), n)
+
+
+if __name__ == '__main__':
+    main(tuple(map(int, sys.argv[1:])) or (100, 1_000, 10_000))
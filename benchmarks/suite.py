@@ -0,0 +1,173 @@
+'''timings of parsing, alpha equivalence, reduction and grading on generated workloads
+
+run with `python -m benchmarks.suite` from the repository root, e.g.
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output results.json --baseline baseline.json --threshold 0.25
+
+workloads are built deterministically from their size parameters, so runs are comparable.
+with a baseline, every timing more than threshold slower than its baseline is reported
+and the exit status is 1.
+'''
+from functools import reduce
+from time import perf_counter
+from timeit import Timer
+from typing import Any, Callable, Iterator, NamedTuple
+import argparse
+import json
+import platform
+import sys
+
+from lambda_calc.ast import App, Fun, LambdaExpr, Var, fold
+from lambda_calc.core import all_beta_reductions, alpha_equiv, is_simple, normalize
+from lambda_calc.parser import parse
+from lambda_calc.serial import dumps, loads
+from lambda_calc.wrapper import check_candidate_str
+
+from .deep import church
+
+
+def text(expr: LambdaExpr) -> str:
+    '''fully parenthesized source of expr, which parses back into expr'''
+    return fold(expr,
+                lambda var, _: var.name,
+                lambda fun, body, _: f"(λ{''.join(arg.name for arg in fun.args)}.{body})",
+                lambda app, fun, arg, _: f'({fun} {arg})')
+
+
+PLUS = parse('λmnfx.m f(n f x)')
+MULT = parse('λmnf.m(n f)')
+
+
+def arithmetic(n: int) -> LambdaExpr:
+    '''n + n * n with Church numerals'''
+    return App(App(PLUS, church(n)), App(App(MULT, church(n)), church(n)))
+
+
+def nested(n: int) -> LambdaExpr:
+    '''n nested abstractions with a redex under each of them'''
+    body: LambdaExpr = Var('z')
+    for i in range(n):
+        name = "v" + "'" * i
+        body = Fun([Var(name)], App(App(Fun([Var('x')], Var('x')), Var(name)), body))
+    return body
+
+
+def wide(n: int) -> LambdaExpr:
+    '''f applied to n redexes'''
+    return reduce(App, [App(Fun([Var('x')], Var('x')), Var('y')) for _ in range(n)], Var('f'))
+
+
+def omega(n: int) -> LambdaExpr:
+    '''(λx.x...x)(λx.x...x) with n copies of x, which only reduces to itself or bigger terms'''
+    fun = Fun([Var('x')], reduce(App, [Var('x')] * n))
+    return App(fun, fun)
+
+
+def candidate(expr: LambdaExpr, steps: int) -> str:
+    '''a correct derivation of expr in normal order, as a student would hand it in'''
+    trace = normalize(expr, max_steps=None, trace=True).trace[:steps]
+    lines = [text(expr)] + [f"{'a' if kind == 'alpha' else 'b'}-> {text(reduced)}" for kind, reduced in trace]
+    return '\n' + '\n'.join(lines) + '\n'
+
+
+class Workload(NamedTuple):
+    name: str
+    expr: LambdaExpr
+
+
+def workloads(scale: int) -> Iterator[Workload]:
+    yield Workload(f'church_arithmetic_{scale}', arithmetic(scale))
+    yield Workload(f'nested_{scale * 20}', nested(scale * 20))
+    yield Workload(f'wide_{scale * 20}', wide(scale * 20))
+    yield Workload(f'omega_{scale * 10}', omega(scale * 10))
+
+
+class Case(NamedTuple):
+    name: str
+    fn: Callable[..., object]
+    # builds the arguments of every call of fn, untimed
+    setup: Callable[[], tuple[Any, ...]] | None = None
+
+
+def cases(scale: int) -> Iterator[Case]:
+    for name, expr in workloads(scale):
+        source = text(expr)
+        copy = parse(source)
+        yield Case(f'parse/{name}', lambda source=source: parse(source))
+        data = dumps(expr)
+        yield Case(f'dumps/{name}', lambda copy=copy: dumps(copy))
+        yield Case(f'loads/{name}', lambda data=data: loads(data))
+        # fresh copies, so the cached de Bruijn forms are not reused
+        yield Case(f'alpha_equiv/{name}', alpha_equiv, lambda source=source: (parse(source), parse(source)))
+        yield Case(f'all_beta_reductions/{name}', lambda copy=copy: list(all_beta_reductions(copy)))
+        yield Case(f'is_simple/{name}', lambda copy=copy: is_simple(copy))
+    expr = arithmetic(scale)
+    initial = text(expr)
+    for steps in (5, 20):
+        submission = candidate(expr, steps)
+        yield Case(f'check_candidate_str/church_arithmetic_{scale}_{steps}_lines',
+                   lambda submission=submission, initial=initial: check_candidate_str(submission, initial))
+
+
+def measure(fn: Callable[..., object], repeat: int, setup: Callable[[], tuple[Any, ...]] | None = None) -> float:
+    '''the best time of one call over repeat rounds, every call gets its own arguments from setup if it is given'''
+    if setup is None:
+        timer = Timer(fn)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat, number)) / number
+    # as many calls per round as take about 0.2 seconds, like autorange
+    start = perf_counter()
+    fn(*setup())
+    number = max(1, min(1000, int(0.2 / max(perf_counter() - start, 1e-6))))
+    best = float('inf')
+    for _ in range(repeat):
+        calls = [setup() for _ in range(number)]
+        start = perf_counter()
+        for args in calls:
+            fn(*args)
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    '''names of the results more than threshold slower than their baseline'''
+    return [name for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', type=int, default=10, help='size parameter of the workloads')
+    parser.add_argument('--repeat', type=int, default=5, help='rounds per timing, the best one is kept')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--output', help='file to write the results to as JSON')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    args = parser.parse_args(argv)
+
+    results: dict[str, float] = {}
+    baseline: dict[str, float] = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+    for name, fn, setup in cases(args.scale):
+        if args.filter not in name:
+            continue
+        results[name] = seconds = measure(fn, args.repeat, setup)
+        change = f'{seconds / baseline[name] - 1:>+8.1%}' if name in baseline else ''
+        print(f'{name:<56}{seconds * 1e3:>12.3f} ms{change}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'scale': args.scale, 'results': results}, file, indent=2)
+
+    regressions = compare(results, baseline, args.threshold)
+    for name in regressions:
+        print(f'regression: {name} is {results[name] / baseline[name] - 1:.1%} slower than the baseline')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,5 @@
 from .core import *
 from .ast import *
 from .parser import *
+from .instrument import *
+from .limits import *
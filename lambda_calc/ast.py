@@ -1,89 +1,550 @@
-from dataclasses import dataclass
-from typing import TypeAlias
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Callable, Iterable, Iterator, TextIO, TypeAlias, TypeVar
+from weakref import WeakValueDictionary
+import string
+import sys
+import threading
+from . import instrument, limits
 
-__all__ = ['LambdaExpr', 'Var', 'Fun', 'App', 'compile']
+__all__ = ['LambdaExpr', 'Var', 'Fun', 'App', 'compile', 'fresh_names',
+           'DBTerm', 'DBVar', 'DBFree', 'DBLam', 'DBApp', 'to_debruijn', 'from_debruijn',
+           'fingerprint', 'free_names', 'fold', 'walk', 'write_expr', 'format_expr']
 
 LambdaExpr: TypeAlias = 'Var | Fun | App'
+R = TypeVar('R')
+S = TypeVar('S')
 
 
-@dataclass
+# assigns the fields of frozen nodes while building them
+_set = object.__setattr__
+
+
+@dataclass(frozen=True, slots=True)
 class Var:
     name: str
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __init__(self, name: str):
+        # names are interned, so equal names are mostly compared by identity
+        name = sys.intern(name)
+        _set(self, 'name', name)
+        _set(self, '_hash', hash(name))
+        if instrument.active is not None:
+            instrument.active.counts['nodes'] += 1
 
     def __hash__(self):
-        return hash(self.name)
+        return self._hash
+
+    def __reduce__(self):
+        return Var, (self.name,)
 
     def __repr__(self):
         return f"Var({self.name!r})"
 
     def __format__(self, format_spec: str) -> str:
         if format_spec != 'terse':
-            return super().__format__(format_spec)
+            return object.__format__(self, format_spec)
         return self.name
 
     def __str__(self):
         return self.name
 
 
-@dataclass
+# nodes are immutable, so their hash is computed once when they are built, from the hashes of their children.
+# to_debruijn and free_names cache their results in the slots _debruijn and _free, which start out unset
+@dataclass(frozen=True, slots=True, eq=False)
 class Fun:
-    args: list[Var]
+    args: tuple[Var, ...]
     body: LambdaExpr
+    _hash: int = field(init=False, repr=False, compare=False)
+    _debruijn: 'DBTerm' = field(init=False, repr=False, compare=False)
+    _free: frozenset[str] = field(init=False, repr=False, compare=False)
+
+    def __init__(self, args: Iterable[Var], body: LambdaExpr):
+        args = tuple(args)
+        _set(self, 'args', args)
+        _set(self, 'body', body)
+        _set(self, '_hash', hash((args, body._hash)))
+        if instrument.active is not None:
+            instrument.active.counts['nodes'] += 1
+
+    def __eq__(self, other):
+        return _equal(self, other) if isinstance(other, Fun) else NotImplemented
 
     def __hash__(self):
-        return hash((tuple(self.args), self.body))
+        return self._hash
+
+    def __reduce__(self):
+        # pickled as the bytes of serial.dumps, which are smaller and do not recurse on deep terms
+        from .serial import dumps, loads
+        return loads, (dumps(self),)
 
     def __repr__(self):
-        return f"Fun([{','.join(map(repr, self.args))}],{self.body!r})"
+        return _repr(self)
 
     def __format__(self, format_spec: str) -> str:
         if format_spec != 'terse':
-            return super().__format__(format_spec)
-        return f"λ{''.join(map(str, self.args))}.{self.body:terse}"
+            return object.__format__(self, format_spec)
+        return format_expr(self, terse=True)
 
     def __str__(self):
-        return f"(λ{''.join(map(str, self.args))}.{self.body:terse})"
+        return format_expr(self)
 
-    def __call__(self, *args, **_):
-        if not hasattr(self, 'fun'):
-            self.__fun = eval(compile(self))
-        return self.__fun(*args)
+    def __call__(self, *args, **free):
+        '''applies the compiled closure of this function to args one at a time, free variables are taken from free'''
+        from .native import compile_closure
+        result = compile_closure(self, **free)
+        for arg in args:
+            result = result(arg)
+        return result
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)
 class App:
     fun: LambdaExpr
     arg: LambdaExpr
+    _hash: int = field(init=False, repr=False, compare=False)
+    _debruijn: 'DBTerm' = field(init=False, repr=False, compare=False)
+    _free: frozenset[str] = field(init=False, repr=False, compare=False)
+
+    def __init__(self, fun: LambdaExpr, arg: LambdaExpr):
+        _set(self, 'fun', fun)
+        _set(self, 'arg', arg)
+        _set(self, '_hash', hash((fun._hash, arg._hash)))
+        if instrument.active is not None:
+            instrument.active.counts['nodes'] += 1
+
+    def __eq__(self, other):
+        return _equal(self, other) if isinstance(other, App) else NotImplemented
 
     def __hash__(self):
-        return hash((self.fun, self.arg))
+        return self._hash
+
+    def __reduce__(self):
+        from .serial import dumps, loads
+        return loads, (dumps(self),)
 
     def __repr__(self):
-        return f"App({self.fun!r},{self.arg!r})"
+        return _repr(self)
 
     def __format__(self, format_spec: str) -> str:
         if format_spec != 'terse':
-            return super().__format__(format_spec)
-
-        match self.fun, self.arg:
-            case (App(), Var()) | (App(), Fun()) | (Var(), Fun()):
-                return f"{self.fun:terse}{self.arg:terse}"
-            case (App(), App()):
-                return f"{self.fun:terse}{self.arg}"
-            case (Fun(), _):
-                return f"{self.fun}{self.arg:terse}"
-            case _:
-                return f"{self.fun}{self.arg}"
+            return object.__format__(self, format_spec)
+        return format_expr(self, terse=True)
 
     def __str__(self):
-        return f"({self.fun}{self.arg})"
+        return format_expr(self)
+
+
+def fold(expr: LambdaExpr,
+         var: Callable[[Var, S], R],
+         fun: Callable[[Fun, R, S], R],
+         app: Callable[[App, R, R, S], R],
+         enter: Callable[[Fun, S], S] | None = None,
+         scope: S = None,
+         keep: Callable[[LambdaExpr, S], bool] | None = None) -> R:
+    '''combines the results of children bottom up, using an explicit stack instead of recursion
+
+    enter gives the scope of a function body from the scope of the function,
+    fun is called with the scope of its body and var and app with their own.
+    nodes keep returns true for are their own result, without visiting their children
+    '''
+    results: list[R] = []
+    stack: list[tuple[LambdaExpr, S, bool]] = [(expr, scope, False)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node, scope, visited = stack.pop()
+        if keep is not None and not visited and keep(node, scope):
+            results.append(node)
+            continue
+        match node:
+            case Var():
+                results.append(var(node, scope))
+            case Fun(_, body):
+                if visited:
+                    results.append(fun(node, results.pop(), scope))
+                else:
+                    stack.append((node, enter(node, scope) if enter else scope, True))
+                    stack.append((body, stack[-1][1], False))
+            case App(fun_, arg):
+                if visited:
+                    arg_ = results.pop()
+                    results.append(app(node, results.pop(), arg_, scope))
+                else:
+                    stack.append((node, scope, True))
+                    stack.append((arg, scope, False))
+                    stack.append((fun_, scope, False))
+    return results[0]
+
+
+def walk(expr: LambdaExpr,
+         enter: Callable[[Fun, S], S] | None = None,
+         scope: S = None) -> Iterator[tuple[LambdaExpr, S]]:
+    '''yields every node of expr in preorder with its scope, using an explicit stack instead of recursion'''
+    stack: list[tuple[LambdaExpr, S]] = [(expr, scope)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node, scope = stack.pop()
+        yield node, scope
+        match node:
+            case Fun(_, body):
+                stack.append((body, enter(node, scope) if enter else scope))
+            case App(fun, arg):
+                stack.append((arg, scope))
+                stack.append((fun, scope))
+
+
+def _equal(e1: LambdaExpr, e2: LambdaExpr) -> bool:
+    stack = [(e1, e2)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        e1, e2 = stack.pop()
+        if e1 is e2:
+            continue
+        if e1._hash != e2._hash:
+            return False
+        match e1, e2:
+            case Var(name1), Var(name2):
+                if name1 != name2:
+                    return False
+            case Fun(args1, body1), Fun(args2, body2):
+                if args1 != args2:
+                    return False
+                stack.append((body1, body2))
+            case App(fun1, arg1), App(fun2, arg2):
+                stack.append((arg1, arg2))
+                stack.append((fun1, fun2))
+            case _:
+                return False
+    return True
+
+
+def _repr(expr: LambdaExpr) -> str:
+    return fold(expr,
+                lambda var, _: repr(var),
+                lambda fun, body, _: f"Fun([{','.join(map(repr, fun.args))}],{body})",
+                lambda app, fun, arg, _: f"App({fun},{arg})")
+
+
+def _pieces(expr: LambdaExpr, terse: bool) -> Iterator[str]:
+    '''the pieces of the parenthesized or terse form of expr in order, using an explicit stack instead of recursion
+
+    terse forms leave out the parentheses of a node where its parent allows it
+    '''
+    stack: list[str | tuple[LambdaExpr, bool]] = [(expr, terse)]
+    governor = limits.current()
+    while stack:
+        item = stack.pop()
+        if type(item) is str:
+            yield item
+            continue
+        if governor is not None:
+            governor.visit()
+        node, terse = item
+        match node:
+            case Var(name):
+                yield name
+            case Fun(args, body):
+                # the body of a function is always terse
+                head = f"λ{''.join(arg.name for arg in args)}."
+                if terse:
+                    stack.append((body, True))
+                    yield head
+                else:
+                    stack.append(')')
+                    stack.append((body, True))
+                    yield '(' + head
+            case App(fun, arg):
+                if terse:
+                    stack.append((arg, not isinstance(arg, App) or isinstance(fun, Fun)))
+                    stack.append((fun, not isinstance(fun, Fun)))
+                else:
+                    stack.append(')')
+                    stack.append((arg, False))
+                    stack.append((fun, False))
+                    yield '('
+
+
+def write_expr(expr: LambdaExpr,
+               out: TextIO | list[str],
+               terse: bool = False,
+               max_width: int | None = None) -> int:
+    '''writes the form of str(expr), or with terse of f'{expr:terse}', to a text stream or appends it to a list piece by piece
+
+    with max_width, a form longer than max_width characters is cut to max_width - 1 of them followed by …
+    and the rest of expr is not visited. returns the number of characters written
+    '''
+    emit = out.append if isinstance(out, list) else out.write
+    if max_width is None:
+        written = 0
+        for piece in _pieces(expr, terse):
+            emit(piece)
+            written += len(piece)
+        return written
+    if max_width < 1:
+        raise ValueError('max_width must be positive')
+    room = max_width - 1
+    # characters past room, written only if they turn out to be the last one
+    held = ''
+    for piece in _pieces(expr, terse):
+        if len(piece) <= room:
+            emit(piece)
+            room -= len(piece)
+            continue
+        if room:
+            emit(piece[:room])
+        held += piece[room:]
+        room = 0
+        if len(held) > 1:
+            emit('…')
+            return max_width
+    if held:
+        emit(held)
+    return max_width - 1 - room + len(held)
+
+
+def format_expr(expr: LambdaExpr, terse: bool = False, max_width: int | None = None) -> str:
+    '''the form write_expr writes, str and format(expr, 'terse') use it'''
+    pieces: list[str] = []
+    write_expr(expr, pieces, terse, max_width)
+    return ''.join(pieces)
 
 
 def compile(expr: LambdaExpr):
-    match expr:
-        case Var(name):
-            return name
-        case Fun(args, body):
-            return f"lambda {','.join(arg.name for arg in args)}: {compile(body)}"
-        case App(fun, arg):
-            return f"({compile(fun)})({compile(arg)})"
+    return fold(expr,
+                lambda var, _: var.name,
+                lambda fun, body, _: f"lambda {','.join(arg.name for arg in fun.args)}: {body}",
+                lambda app, fun, arg, _: f"({fun})({arg})")
+
+
+def fresh_names(used: Iterable[str] = ()) -> Iterator[str]:
+    '''yields an unbounded supply of variable names a..z, a'..z', a''.. skipping used ones'''
+    used = set(used)
+    for primes in count():
+        for char in string.ascii_lowercase:
+            name = char + "'" * primes
+            if name not in used:
+                yield name
+
+
+# interned de Bruijn terms, keyed by their class and fields
+_interned: WeakValueDictionary[tuple, 'DBVar | DBFree | DBLam | DBApp'] = WeakValueDictionary()
+_no_names: frozenset[str] = frozenset()
+_intern_lock = threading.Lock()
+
+
+class _Interned:
+    '''base of the hash-consed de Bruijn nodes, structurally equal terms are the same object'''
+    __slots__ = ('_hash', 'free', '__weakref__')
+    __match_args__: tuple[str, ...] = ()
+
+    def __new__(cls, *fields):
+        key = (cls, *fields)
+        term = _interned.get(key)
+        if term is None:
+            term = object.__new__(cls)
+            for slot, value in zip(cls.__match_args__, fields):
+                object.__setattr__(term, slot, value)
+            object.__setattr__(term, '_hash', hash((cls.__name__, *fields)))
+            object.__setattr__(term, 'free', term._free_names())
+            # another thread may have interned the same term meanwhile, the first one stored wins
+            with _intern_lock:
+                stored = _interned.get(key)
+                if stored is None:
+                    _interned[key] = term
+                else:
+                    term = stored
+        return term
+
+    def __setattr__(self, *_):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, slot) for slot in self.__match_args__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({','.join(repr(getattr(self, slot)) for slot in self.__match_args__)})"
+
+
+class DBVar(_Interned):
+    '''a bound variable, index counts the binders between it and its own'''
+    __slots__ = ('index',)
+    __match_args__ = ('index',)
+    index: int
+
+    def _free_names(self):
+        return _no_names
+
+
+class DBFree(_Interned):
+    '''a free variable, kept by name'''
+    __slots__ = ('name',)
+    __match_args__ = ('name',)
+    name: str
+
+    def _free_names(self):
+        return frozenset((self.name,))
+
+
+class DBLam(_Interned):
+    __slots__ = ('body',)
+    __match_args__ = ('body',)
+    body: 'DBTerm'
+
+    def _free_names(self):
+        return self.body.free
+
+
+class DBApp(_Interned):
+    __slots__ = ('fun', 'arg')
+    __match_args__ = ('fun', 'arg')
+    fun: 'DBTerm'
+    arg: 'DBTerm'
+
+    def _free_names(self):
+        if self.arg.free <= self.fun.free:
+            return self.fun.free
+        if self.fun.free <= self.arg.free:
+            return self.arg.free
+        return self.fun.free | self.arg.free
+
+
+DBTerm: TypeAlias = 'DBVar | DBFree | DBLam | DBApp'
+
+
+def to_debruijn(expr: LambdaExpr) -> DBTerm:
+    '''converts expr into its interned de Bruijn form, alpha equivalent expressions give the same object'''
+    cached = getattr(expr, '_debruijn', None)
+    if cached is not None:
+        return cached
+    # name -> depths of the binders currently in scope for it
+    scope: dict[str, list[int]] = {}
+    depth = 0
+    results: list[DBTerm] = []
+    stack: list[LambdaExpr | tuple[Fun | None]] = [expr]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node = stack.pop()
+        match node:
+            case Var(name):
+                levels = scope.get(name)
+                results.append(DBVar(depth - levels[-1] - 1) if levels else DBFree(name))
+            case Fun(args, body):
+                for arg in args:
+                    scope.setdefault(arg.name, []).append(depth)
+                    depth += 1
+                stack.append((node,))
+                stack.append(body)
+            case App(fun, arg):
+                stack.append((None,))
+                stack.append(arg)
+                stack.append(fun)
+            case (None,):
+                arg_ = results.pop()
+                results.append(DBApp(results.pop(), arg_))
+            case (Fun(args),):
+                term = results.pop()
+                for arg in reversed(args):
+                    scope[arg.name].pop()
+                    term = DBLam(term)
+                depth -= len(args)
+                results.append(term)
+    if not isinstance(expr, Var):
+        _set(expr, '_debruijn', results[0])
+    return results[0]
+
+
+def fingerprint(expr: LambdaExpr) -> int:
+    '''a hash of expr that is invariant under alpha renaming, cached on the expression'''
+    return hash(to_debruijn(expr))
+
+
+def free_names(expr: LambdaExpr) -> frozenset[str]:
+    '''the names of the free variables of expr, cached on every function and application below it'''
+    if isinstance(expr, Var):
+        return frozenset((expr.name,))
+    cached = getattr(expr, '_free', None)
+    if cached is not None:
+        return cached
+    results: list[frozenset[str]] = []
+    stack: list[LambdaExpr | tuple[Fun | App]] = [expr]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node = stack.pop()
+        match node:
+            case Var(name):
+                results.append(frozenset((name,)))
+            case Fun() | App() if hasattr(node, '_free'):
+                results.append(node._free)
+            case Fun(_, body):
+                stack.append((node,))
+                stack.append(body)
+            case App(fun, arg):
+                stack.append((node,))
+                stack.append(arg)
+                stack.append(fun)
+            case (Fun(args) as fun,):
+                names = results.pop()
+                if any(arg.name in names for arg in args):
+                    names = names - {arg.name for arg in args}
+                _set(fun, '_free', names)
+                results.append(names)
+            case (App() as app,):
+                arg_names = results.pop()
+                names = results.pop()
+                if not arg_names <= names:
+                    names = names | arg_names
+                _set(app, '_free', names)
+                results.append(names)
+    return results[0]
+
+
+def from_debruijn(term: DBTerm, names: Iterable[str] | None = None) -> LambdaExpr:
+    '''converts a de Bruijn term back into named form, binders at depth d take the d-th unused name of names'''
+    supply = fresh_names(term.free) if names is None else (name for name in names if name not in term.free)
+    binders: list[str] = []
+    # the name of a binder only depends on its depth, so siblings reuse the same names
+    depth = 0
+    results: list[LambdaExpr] = []
+    stack: list[DBTerm | tuple[DBTerm]] = [term]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node = stack.pop()
+        match node:
+            case DBVar(index):
+                results.append(Var(binders[depth - index - 1]))
+            case DBFree(name):
+                results.append(Var(name))
+            case DBLam(body):
+                if depth == len(binders):
+                    binders.append(next(supply))
+                depth += 1
+                stack.append((node,))
+                stack.append(body)
+            case DBApp(fun, arg):
+                stack.append((node,))
+                stack.append(arg)
+                stack.append(fun)
+            case (DBLam(),):
+                depth -= 1
+                results.append(Fun([Var(binders[depth])], results.pop()))
+            case (DBApp(),):
+                arg_ = results.pop()
+                results.append(App(results.pop(), arg_))
+    return results[0]
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+import sys
+from .ast import App, DBTerm, Fun, LambdaExpr, fingerprint, to_debruijn
+from .core import ReductionIndex, ReductionType, all_beta_reductions, is_simple
+
+__all__ = ['ReductionCache', 'CacheStats']
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+
+class _Entry:
+    '''the one step reductions of expr, with their index once it is asked for'''
+    __slots__ = ('expr', 'reductions', 'index', 'bytes')
+
+    def __init__(self, expr: LambdaExpr, reductions: list[tuple[ReductionType, LambdaExpr]], bytes: int):
+        self.expr = expr
+        self.reductions = reductions
+        self.index: ReductionIndex | None = None
+        self.bytes = bytes
+
+
+def _bytes(exprs: Iterable[LambdaExpr]) -> int:
+    '''approximate memory of the distinct nodes of exprs, nodes shared between them are counted once'''
+    seen: set[int] = set()
+    total = 0
+    stack = list(exprs)
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        total += sys.getsizeof(node)
+        match node:
+            case Fun(args, body):
+                total += sys.getsizeof(args)
+                stack.extend(args)
+                stack.append(body)
+            case App(fun, arg):
+                stack.append(fun)
+                stack.append(arg)
+    return total
+
+
+class ReductionCache:
+    '''least recently used cache of one step reductions and is_simple, keyed by de Bruijn term
+
+    alpha equivalent terms share their key. is_simple only depends on the key, but which redexes need an alpha
+    step first depends on the names of the binders, so reductions are reused for equal terms and recomputed
+    (replacing the entry) for other members of the alpha class.
+    evicts entries beyond maxsize of them or beyond maxbytes of estimated memory held by their terms.
+    '''
+
+    def __init__(self, maxsize: int = 4096, maxbytes: int = 256 * 2 ** 20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._entries: OrderedDict[DBTerm, _Entry] = OrderedDict()
+        self._simple: OrderedDict[DBTerm, bool] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, expr: LambdaExpr) -> _Entry:
+        key = to_debruijn(expr)
+        entry = self._entries.get(key)
+        if entry is not None and (entry.expr is expr or entry.expr == expr):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        reductions = list(all_beta_reductions(expr))
+        entry = _Entry(expr, reductions, _bytes([expr, *(reduct for _, reduct in reductions)]))
+        self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.bytes
+        self._simple[key] = not reductions
+        self._evict()
+        return entry
+
+    def _remove(self, key: DBTerm):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.bytes
+
+    def _evict(self):
+        while len(self._entries) > 1 and (len(self._entries) > self.maxsize or self._bytes > self.maxbytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.bytes
+            self.evictions += 1
+        while len(self._simple) > self.maxsize:
+            self._simple.popitem(last=False)
+            self.evictions += 1
+
+    def reductions(self, expr: LambdaExpr) -> list[tuple[ReductionType, LambdaExpr]]:
+        '''all_beta_reductions of expr, as a list that must not be modified'''
+        return self._entry(expr).reductions
+
+    def index(self, expr: LambdaExpr) -> ReductionIndex:
+        '''reduction_index of expr'''
+        entry = self._entry(expr)
+        if entry.index is None:
+            entry.index = {}
+            for reduction in entry.reductions:
+                entry.index.setdefault(fingerprint(reduction[1]), []).append(reduction)
+        return entry.index
+
+    def is_simple(self, expr: LambdaExpr) -> bool:
+        key = to_debruijn(expr)
+        simple = self._simple.get(key)
+        if simple is not None:
+            self.hits += 1
+            self._simple.move_to_end(key)
+            return simple
+        self.misses += 1
+        self._simple[key] = simple = is_simple(expr)
+        self._evict()
+        return simple
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self._bytes)
+
+    def clear(self):
+        self._entries.clear()
+        self._simple.clear()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
@@ -1,198 +1,538 @@
-from typing import Generator, Literal, TypeAlias, List
+from typing import Generator, Iterable, Iterator, Literal, NamedTuple, TypeAlias, List
 from functools import reduce
-from .ast import Var, Fun, App, LambdaExpr
-import string
+from .ast import (Var, Fun, App, LambdaExpr, DBApp, DBLam, DBTerm, fingerprint, fold, free_names, fresh_names,
+                  to_debruijn, walk)
+from . import instrument, limits
+from .limits import ResourceLimitExceeded
 
 __all__ = ['alpha_equiv', 'substitute', 'get_env', 'curry', 'alpha_rename',
-           'all_beta_reductions', 'is_valid_reduction', 'is_simple']
+           'all_beta_reductions', 'is_valid_reduction', 'is_simple', 'reduction_index', 'find_reduction',
+           'reduce_redex', 'find_redex', 'normalize', 'Normalization', 'StepLimitExceeded',
+           'redex_paths', 'subterm', 'reduce_at', 'diff_path', 'substitute_avoiding', 'contract', 'contract_at']
 
 # env map variable ids to itself and bounding functions
 Env: TypeAlias = dict[int, tuple[Var, Fun | None]]
+ReductionType: TypeAlias = Literal["alpha"] | Literal["beta"]
+# one step reductions grouped by their alpha invariant fingerprint
+ReductionIndex: TypeAlias = dict[int, list[tuple[ReductionType, LambdaExpr]]]
+# a parent node, which of its children leads to the current node, and the link of the parent
+Link: TypeAlias = 'tuple[Fun | App, Literal["fun", "arg", "body"], Link] | None'
+Strategy: TypeAlias = Literal["normal"] | Literal["applicative"] | Literal["head"]
+# the children taken from the root to reach a node
+Path: TypeAlias = tuple[Literal["fun", "arg", "body"], ...]
 
 
+@instrument.timed('get_env')
 def get_env(expr: LambdaExpr) -> Env:
     '''returns a mapping of variable ids to its bounding functions, in context of expr'''
-    def get_env_helper(expr: LambdaExpr, scope: dict[str, Fun]) -> Env:
-        match expr:
-            case Var(name):
-                if name in scope:
-                    return {id(expr): (expr, scope[name])}
-                else:
-                    return {id(expr): (expr, None)}
+    return {id(var): (var, binders[-1] if binders else None) for var, scope in _occurrences(expr)
+            for binders in (scope.get(var.name),)}
+
+
+def _occurrences(expr: LambdaExpr, name: str | None = None) -> Iterator[tuple[Var, dict[str, list[Fun]]]]:
+    '''yields every variable occurrence in expr with the functions binding each name around it, innermost last
+
+    the scope is one dict updated in place while walking, so it is only valid until the next occurrence.
+    with a name, only subtrees where it occurs free are walked
+    '''
+    scope: dict[str, list[Fun]] = {}
+    stack: list[LambdaExpr | tuple[Fun]] = [expr]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node = stack.pop()
+        if name is not None and isinstance(node, (Fun, App)) and name not in free_names(node):
+            continue
+        match node:
+            case Var():
+                yield node, scope
             case Fun(args, body):
-                return get_env_helper(body, scope | {arg.name: expr for arg in args})
+                for arg in args:
+                    scope.setdefault(arg.name, []).append(node)
+                stack.append((node,))
+                stack.append(body)
             case App(fun, arg):
-                return get_env_helper(fun, scope) | get_env_helper(arg, scope)
-    return get_env_helper(expr, {})
+                stack.append(arg)
+                stack.append(fun)
+            case (Fun(args),):
+                for arg in args:
+                    scope[arg.name].pop()
+
+
+def _rebuild_fun(fun: Fun, body: LambdaExpr, _=None) -> Fun:
+    return fun if body is fun.body else Fun(fun.args, body)
+
+
+def _rebuild_app(app: App, fun: LambdaExpr, arg: LambdaExpr, _=None) -> App:
+    return app if fun is app.fun and arg is app.arg else App(fun, arg)
 
 
 def curry(expr: LambdaExpr) -> LambdaExpr:
     '''desugar curried arguments in the expression'''
-    match expr:
-        case Var():
-            return expr
-        case Fun(args, body) if len(args) > 1:
-            return reduce(lambda acc, arg: Fun([arg], acc), reversed(args[:-1]), Fun([args[-1]], curry(body)))
-        case Fun(arg, body):
-            body_ = curry(body)
-            if body_ is body:
-                return expr
-            return Fun(arg, body_)
-        case App(fun, arg):
-            return App(curry(fun), curry(arg))
+    def curry_fun(fun: Fun, body: LambdaExpr, _) -> LambdaExpr:
+        if len(fun.args) > 1:
+            return reduce(lambda acc, arg: Fun([arg], acc), reversed(fun.args[:-1]), Fun([fun.args[-1]], body))
+        return _rebuild_fun(fun, body)
+    return fold(expr, lambda var, _: var, curry_fun, _rebuild_app)
 
 
+@instrument.timed('alpha_equiv')
 def alpha_equiv(e1: LambdaExpr, e2: LambdaExpr) -> bool:
     '''checks if two expressions are alpha equivalent'''
-    e1 = curry(e1)
-    e2 = curry(e2)
-
-    env1 = get_env(e1)
-    env2 = get_env(e2)
-
-    def alpha_equiv_helper(
-            e1: LambdaExpr,
-            e2: LambdaExpr,
-            cycle: list[tuple[LambdaExpr, LambdaExpr]] = []) -> bool:
-        if any(e1 is e1_ and e2 is e2_ for e1_, e2_ in cycle):
-            return True
-        match e1, e2:
-            # both variables
-            case Var(name1), Var(name2):
-                match env1[id(e1)], env2[id(e2)]:
-                    # both free variables
-                    case (_, None), (_, None):
-                        return name1 == name2
-                    # both bounded variables
-                    case (_, Fun() as s1), (_, Fun() as s2):
-                        return alpha_equiv_helper(s1, s2, cycle + [(e1, e2)])
-                    # one free, one bounded
-                    case _, _:
-                        return False
-            # both functions
-            case Fun(args1, body1), Fun(args2, body2):
-                return len(args1) == len(args2) and alpha_equiv_helper(body1, body2, cycle)
-            # both applications
-            case App(fun1, arg1), App(fun2, arg2):
-                return alpha_equiv_helper(fun1, fun2, cycle) and alpha_equiv_helper(arg1, arg2, cycle)
-            # different types
-            case _, _:
-                return False
-    return alpha_equiv_helper(e1, e2)
+    # de Bruijn terms are interned, so alpha equivalent expressions convert to the same object
+    t1, t2 = to_debruijn(e1), to_debruijn(e2)
+    if instrument.active is not None:
+        counts = instrument.active.counts
+        counts['alpha_equiv max depth'] = max(counts['alpha_equiv max depth'], _depth(t1), _depth(t2))
+    return t1 is t2
+
+
+def _depth(term: DBTerm) -> int:
+    '''the number of nodes on the longest path from the root of term to a leaf'''
+    deepest = 0
+    stack = [(term, 1)]
+    while stack:
+        term, depth = stack.pop()
+        deepest = max(deepest, depth)
+        match term:
+            case DBLam(body):
+                stack.append((body, depth + 1))
+            case DBApp(fun, arg):
+                stack.append((fun, depth + 1))
+                stack.append((arg, depth + 1))
+    return deepest
 
 
 def substitute(expr: LambdaExpr, to_replace: Var, replacement: LambdaExpr, fun: Fun, env: Env) -> LambdaExpr:
     '''substitute a variable with another expression in the given env'''
-    def substitute_helper(expr: LambdaExpr) -> LambdaExpr:
-        match expr:
-            case Var(name):
-                if name != to_replace.name:
-                    return expr
-                if env[id(expr)][1] is fun:
-                    return replacement
-                return expr
-            case Fun(args, body):
-                if any(arg.name == to_replace.name for arg in args):
-                    return expr
-                return Fun(args, substitute_helper(body))
-            case App(fun_, arg):
-                return App(substitute_helper(fun_), substitute_helper(arg))
-    return substitute_helper(expr)
+    # expr is the body of fun, so an occurrence is bound by fun unless a function in between shadows it.
+    # this is checked while walking rather than with env, since reduced terms share subtrees between
+    # different binders and a variable id can not tell them apart.
+    # subtrees without a free occurrence are shared with expr, including functions shadowing to_replace
+    def untouched(node: LambdaExpr, _) -> bool:
+        return not isinstance(node, Var) and to_replace.name not in free_names(node)
 
+    def substitute_var(var: Var, _) -> LambdaExpr:
+        if var.name == to_replace.name:
+            return replacement
+        return var
 
-def vars_need_renaming(expr: LambdaExpr, free_vars: set[Var], to_replace: Var, fun: Fun, env: Env) -> list[tuple[int, str]]:
-    '''returns a list of variables that need renaming to avoid name conflicts with free variables'''
-    if not free_vars:
-        return []
+    return fold(expr, substitute_var, _rebuild_fun, _rebuild_app, keep=untouched)
 
-    def vars_need_renaming_helper(expr: LambdaExpr, scope: dict[str, list[int]]) -> list[tuple[int, str]]:
-        match expr:
-            case Var(name):
-                if name == to_replace.name and env[id(expr)][1] is fun:
-                    return [(fun, free.name) for free in free_vars for fun in scope.get(free.name, [])]
-                # if env[id(expr)][1] == None and expr in free_vars:
-                #     return [(fun, name) for fun in scope.get(name, [])]
-                return []
-            case Fun(args, body):
-                return vars_need_renaming_helper(body, scope |
-                                                 {arg.name: scope.get(arg.name, []) + [id(expr)] for arg in args})
-            case App(fun_, arg):
-                return vars_need_renaming_helper(fun_, scope) + vars_need_renaming_helper(arg, scope)
-    return vars_need_renaming_helper(expr, {})
+
+def vars_need_renaming(
+        expr: LambdaExpr,
+        free_vars: Iterable[str],
+        to_replace: Var,
+        fun: Fun,
+        env: Env | None = None) -> list[tuple[int, str]]:
+    '''returns a list of (binder id, name) of the binders in expr that would capture the free variables'''
+    if not free_vars or to_replace.name not in free_names(expr):
+        return []
+    return [(id(binder), name)
+            for var, scope in _occurrences(expr, to_replace.name)
+            if var.name == to_replace.name and not scope.get(var.name)
+            for name in free_vars for binder in scope.get(name, ())]
 
 
-def alpha_rename(expr: LambdaExpr, vars_to_rename: list[tuple[int, str]], env: Env):
-    '''rename variables in the expression to avoid name conflicts with free variables'''
+def _names(*exprs: LambdaExpr) -> set[str]:
+    '''every name in exprs, of variables and of binders'''
+    names: set[str] = set()
+    for expr in exprs:
+        for node, _ in walk(expr):
+            match node:
+                case Var(name):
+                    names.add(name)
+                case Fun(args):
+                    names.update(arg.name for arg in args)
+    return names
 
-    # Get all chars from a to z and from a' to z'
-    available_names = iter(set(list(string.ascii_lowercase) + [char + "'" for char in list(string.ascii_lowercase)]) - {var.name for (var, _) in env.values()})
 
-    def get_new_name(): return next(available_names)
+def alpha_rename(expr: LambdaExpr, vars_to_rename: list[tuple[int, str]], env: Env | None = None):
+    '''rename variables in the expression to avoid name conflicts with free variables
 
+    new names are not used in expr or in env, which only has the names of variables that occur
+    '''
     if not vars_to_rename:
         return expr
 
-    def rename_helper(expr: LambdaExpr, rename_to: dict[str, str]) -> LambdaExpr:
-        match expr:
-            case Var(name):
-                # if not a free variable and needs renaming
-                if env[id(expr)][1] and name in rename_to:
-                    return Var(rename_to[name])
-                return expr
-            case Fun(args, body):
-                #! will error if name runs out
-                new_names = {
-                    arg.name: get_new_name() for arg in args if (id(expr), arg.name) in vars_to_rename
-                }
-                # no new names also means no renaming needed
-                if not new_names:
-                    return expr
-                return Fun([Var(new_names.get(arg.name, arg.name)) for arg in args],
-                           rename_helper(body, rename_to | new_names))
-            case App(fun, arg):
-                return App(rename_helper(fun, rename_to), rename_helper(arg, rename_to))
-    return rename_helper(expr, {})
+    used = _names(expr)
+    if env is not None:
+        used.update(var.name for (var, _) in env.values())
+    available_names = fresh_names(used)
+
+    def get_new_name(): return next(available_names)
 
+    def rename_scope(fun: Fun, rename_to: dict[str, str]) -> dict[str, str]:
+        new_names = {
+            arg.name: get_new_name() for arg in fun.args if (id(fun), arg.name) in vars_to_rename
+        }
+        # arguments that keep their names shadow outer renames
+        if any(arg.name in rename_to and arg.name not in new_names for arg in fun.args):
+            rename_to = {name: new for name, new in rename_to.items() if all(arg.name != name for arg in fun.args)}
+        return rename_to | new_names if new_names else rename_to
 
-def all_beta_reductions(expr: LambdaExpr) -> Generator[tuple[Literal["alpha"] | Literal["beta"], LambdaExpr], None, None]:
-    env = get_env(expr)
+    def rename_var(var: Var, rename_to: dict[str, str]) -> LambdaExpr:
+        # only bound variables are in rename_to
+        if var.name in rename_to:
+            return Var(rename_to[var.name])
+        return var
 
-    def all_beta_reductions_helper(expr: LambdaExpr):
-        match expr:
-            case Fun(args, body):
-                yield from ((t, Fun(args, body)) for t, body in all_beta_reductions_helper(body))
-            case App(Fun(args, body) as fun, arg):
-                to_replace, *tail = args
-                arg_env = get_env(arg)
-                arg_free_vars = {var for (var, env) in arg_env.values() if env is None}
-                vars_to_rename = vars_need_renaming(body, arg_free_vars, to_replace, fun, env)
-                if vars_to_rename:
-                    # alpha-reduction
-                    yield "alpha", App(Fun(args, alpha_rename(body, vars_to_rename, env)), arg)
-                elif tail:
-                    # beta-reduction
-                    yield "beta", Fun(tail, substitute(body, to_replace, arg, fun, env))
-                else:
-                    # beta-reduction
-                    yield "beta", substitute(body, to_replace, arg, fun, env)
-                yield from ((t, App(fun, arg)) for t, arg in all_beta_reductions_helper(arg))
+    def rename_fun(fun: Fun, body: LambdaExpr, rename_to: dict[str, str]) -> LambdaExpr:
+        if any((id(fun), arg.name) in vars_to_rename for arg in fun.args):
+            return Fun([Var(rename_to[arg.name]) if (id(fun), arg.name) in vars_to_rename else arg for arg in fun.args],
+                       body)
+        return _rebuild_fun(fun, body)
+    return fold(expr, rename_var, rename_fun, _rebuild_app, rename_scope, {})
+
+
+def reduce_redex(fun: Fun, arg: LambdaExpr, env: Env | None = None) -> tuple[ReductionType, LambdaExpr]:
+    '''reduces the redex App(fun, arg), alpha renaming fun first if arg would be captured
+
+    new names of an alpha renaming are not used in env, or in the redex if there is no env
+    '''
+    governor = limits.current()
+    if governor is not None:
+        governor.step()
+    args, body = fun.args, fun.body
+    to_replace, *tail = args
+    vars_to_rename = vars_need_renaming(body, free_names(arg), to_replace, fun)
+    if vars_to_rename:
+        # alpha-reduction
+        if instrument.active is not None:
+            instrument.active.counts['alpha renames'] += 1
+        env = get_env(App(fun, arg)) if env is None else env
+        return "alpha", App(Fun(args, alpha_rename(body, vars_to_rename, env)), arg)
+    elif tail:
+        # beta-reduction
+        return "beta", Fun(tail, substitute(body, to_replace, arg, fun, env))
+    else:
+        # beta-reduction
+        return "beta", substitute(body, to_replace, arg, fun, env)
+
+
+def _substitute_avoiding(
+        expr: LambdaExpr,
+        to_replace: Var,
+        replacement: LambdaExpr,
+        names: Iterator[str] | None = None) -> tuple[LambdaExpr, bool]:
+    '''substitute_avoiding, also telling if a binder was renamed'''
+    avoid = free_names(replacement)
+    if names is None:
+        names = fresh_names(_names(expr, replacement))
+    renamed = False
+
+    # the scope is the renamed binders around a node, and whether to_replace is not shadowed there
+    def enter(fun: Fun, scope: tuple[dict[str, str], bool]) -> tuple[dict[str, str], bool]:
+        nonlocal renamed
+        rename_to, active = scope
+        shadows = any(arg.name == to_replace.name for arg in fun.args)
+        # binders only capture if replacement is substituted in their body
+        capture = active and not shadows and to_replace.name in free_names(fun.body)
+        new_rename_to = rename_to
+        for arg in fun.args:
+            if capture and arg.name in avoid:
+                if new_rename_to is rename_to:
+                    new_rename_to = dict(rename_to)
+                new_rename_to[arg.name] = next(names)
+                renamed = True
+            elif arg.name in new_rename_to:
+                # arguments that keep their names shadow outer renames
+                if new_rename_to is rename_to:
+                    new_rename_to = dict(rename_to)
+                del new_rename_to[arg.name]
+        return new_rename_to, active and not shadows
+
+    def untouched(node: LambdaExpr, scope: tuple[dict[str, str], bool]) -> bool:
+        if isinstance(node, Var):
+            return False
+        rename_to, active = scope
+        names_ = free_names(node)
+        return (not active or to_replace.name not in names_) and rename_to.keys().isdisjoint(names_)
+
+    def substitute_var(var: Var, scope: tuple[dict[str, str], bool]) -> LambdaExpr:
+        rename_to, active = scope
+        if active and var.name == to_replace.name:
+            return replacement
+        if var.name in rename_to:
+            return Var(rename_to[var.name])
+        return var
+
+    def rebuild_fun(fun: Fun, body: LambdaExpr, scope: tuple[dict[str, str], bool]) -> LambdaExpr:
+        rename_to, _ = scope
+        if any(arg.name in rename_to for arg in fun.args):
+            return Fun([Var(rename_to[arg.name]) if arg.name in rename_to else arg for arg in fun.args], body)
+        return _rebuild_fun(fun, body)
+
+    result = fold(expr, substitute_var, rebuild_fun, _rebuild_app, enter, ({}, True), untouched)
+    return result, renamed
+
+
+def substitute_avoiding(
+        expr: LambdaExpr,
+        to_replace: Var,
+        replacement: LambdaExpr,
+        names: Iterator[str] | None = None) -> LambdaExpr:
+    '''substitutes the free occurrences of to_replace in expr with replacement in a single pass
+
+    binders that would capture a free variable of replacement are renamed on the way, with names taken from names,
+    by default the fresh_names not used in expr or replacement.
+    '''
+    return _substitute_avoiding(expr, to_replace, replacement, names)[0]
+
+
+def contract(fun: Fun, arg: LambdaExpr) -> tuple[ReductionType, LambdaExpr]:
+    '''beta reduces the redex App(fun, arg) in one step with substitute_avoiding
+
+    the reduction type is alpha if binders had to be renamed on the way, where reduce_redex takes an alpha step first
+    '''
+    governor = limits.current()
+    if governor is not None:
+        governor.step()
+    to_replace, *tail = fun.args
+    # the other arguments are binders around the body, renamed like any other if they would capture
+    body = Fun(tail, fun.body) if tail else fun.body
+    reduced, renamed = _substitute_avoiding(body, to_replace, arg, fresh_names(_names(fun, arg)))
+    if renamed and instrument.active is not None:
+        instrument.active.counts['alpha renames'] += 1
+    return ("alpha" if renamed else "beta"), reduced
+
+
+def all_beta_reductions(expr: LambdaExpr) -> Generator[tuple[ReductionType, LambdaExpr], None, None]:
+    # each node is kept with a link to its parent, so a reduction can be rebuilt up to the root
+    stack: list[tuple[LambdaExpr, Link]] = [(expr, None)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node, link = stack.pop()
+        match node:
+            case Fun(_, body):
+                stack.append((body, (node, 'body', link)))
+            case App(Fun() as fun, arg):
+                if instrument.active is not None:
+                    instrument.active.counts['redexes'] += 1
+                reduction_type, reduced = reduce_redex(fun, arg)
+                yield reduction_type, _plug(reduced, link)
+                stack.append((arg, (node, 'arg', link)))
             case App(fun, arg):
-                yield from ((t, App(fun, arg)) for t, fun in all_beta_reductions_helper(fun))
-                yield from ((t, App(fun, arg)) for t, arg in all_beta_reductions_helper(arg))
+                stack.append((arg, (node, 'arg', link)))
+                stack.append((fun, (node, 'fun', link)))
             case _:
                 # no need to reduce variables
                 pass
-    yield from all_beta_reductions_helper(expr)
+
+
+def _plug(expr: LambdaExpr, link: Link) -> LambdaExpr:
+    '''replaces the node at the end of link with expr, copying its ancestors'''
+    while link:
+        parent, side, link = link
+        match parent:
+            case Fun(args):
+                expr = Fun(args, expr)
+            case App(fun, arg):
+                expr = App(expr, arg) if side == 'fun' else App(fun, expr)
+    return expr
+
+
+def redex_paths(expr: LambdaExpr) -> Iterator[Path]:
+    '''yields the paths of the redexes all_beta_reductions reduces, in the same order, without reducing them'''
+    # paths are kept as linked lists (side, parent path), so they are only spelled out for redexes
+    stack: list[tuple[LambdaExpr, tuple | None]] = [(expr, None)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node, link = stack.pop()
+        match node:
+            case Fun(_, body):
+                stack.append((body, ('body', link)))
+            case App(Fun(), arg):
+                if instrument.active is not None:
+                    instrument.active.counts['redexes'] += 1
+                yield _spell(link)
+                stack.append((arg, ('arg', link)))
+            case App(fun, arg):
+                stack.append((arg, ('arg', link)))
+                stack.append((fun, ('fun', link)))
+
+
+def _spell(link: tuple | None) -> Path:
+    sides = []
+    while link:
+        side, link = link
+        sides.append(side)
+    return tuple(reversed(sides))
+
+
+def _follow(expr: LambdaExpr, path: Path) -> tuple[LambdaExpr, Link]:
+    link: Link = None
+    for side in path:
+        match expr, side:
+            case Fun(_, body), 'body':
+                link, expr = (expr, side, link), body
+            case App(fun, _), 'fun':
+                link, expr = (expr, side, link), fun
+            case App(_, arg), 'arg':
+                link, expr = (expr, side, link), arg
+            case _:
+                raise ValueError(f'no {side} in {expr}')
+    return expr, link
+
+
+def subterm(expr: LambdaExpr, path: Path) -> LambdaExpr:
+    '''the node of expr at the end of path'''
+    return _follow(expr, path)[0]
+
+
+def reduce_at(expr: LambdaExpr, path: Path, env: Env | None = None) -> tuple[ReductionType, LambdaExpr]:
+    '''reduces the redex at path like all_beta_reductions does, copying only the nodes on the path
+
+    new names of an alpha renaming are not used in env, or in the redex if there is no env
+    '''
+    redex, link = _follow(expr, path)
+    if not isinstance(redex, App) or not isinstance(redex.fun, Fun):
+        raise ValueError(f'{redex} is not a redex')
+    reduction_type, reduced = reduce_redex(redex.fun, redex.arg, env)
+    return reduction_type, _plug(reduced, link)
+
+
+def contract_at(expr: LambdaExpr, path: Path) -> tuple[ReductionType, LambdaExpr]:
+    '''contracts the redex at path like reduce_at, with its alpha renaming done in the same step'''
+    redex, link = _follow(expr, path)
+    if not isinstance(redex, App) or not isinstance(redex.fun, Fun):
+        raise ValueError(f'{redex} is not a redex')
+    reduction_type, reduced = contract(redex.fun, redex.arg)
+    return reduction_type, _plug(reduced, link)
+
+
+def diff_path(e1: LambdaExpr, e2: LambdaExpr) -> Path | None:
+    '''the path of the deepest node outside of which e1 and e2 are equal, None if they are equal
+
+    a single reduction only changes the subterm at its redex, so the redex is on this path.
+    '''
+    if e1 == e2:
+        return None
+    path: list[Literal["fun", "arg", "body"]] = []
+    while True:
+        match e1, e2:
+            case Fun(args1, body1), Fun(args2, body2) if args1 == args2:
+                e1, e2, side = body1, body2, 'body'
+            case App(fun1, arg1), App(fun2, arg2):
+                if fun1 == fun2:
+                    e1, e2, side = arg1, arg2, 'arg'
+                elif arg1 == arg2:
+                    e1, e2, side = fun1, fun2, 'fun'
+                else:
+                    return tuple(path)
+            case _:
+                return tuple(path)
+        path.append(side)
+
+
+def reduction_index(expr: LambdaExpr) -> ReductionIndex:
+    '''groups all one step reductions of expr by fingerprint, keeping their enumeration order'''
+    index: ReductionIndex = {}
+    for reduction in all_beta_reductions(expr):
+        index.setdefault(fingerprint(reduction[1]), []).append(reduction)
+    return index
+
+
+def find_reduction(
+        index: ReductionIndex,
+        expr: LambdaExpr,
+        reduction_type: ReductionType | None = None) -> tuple[ReductionType, LambdaExpr] | None:
+    '''looks up the first reduction in index alpha equivalent to expr, optionally of the given type'''
+    for reduction in index.get(fingerprint(expr), ()):
+        # fingerprints can collide, so matches are confirmed exactly
+        if reduction_type in (None, reduction[0]) and alpha_equiv(reduction[1], expr):
+            return reduction
+    return None
 
 
 def is_valid_reduction(expr: LambdaExpr, reduction: LambdaExpr) -> bool:
-    return any(alpha_equiv(reduction, reduced) for _, reduced in all_beta_reductions(expr))
+    return find_reduction(reduction_index(expr), reduction) is not None
 
 
 def is_simple(expr: LambdaExpr) -> bool:
     return not any(True for _ in all_beta_reductions(expr))
 
 
+class Normalization(NamedTuple):
+    expr: LambdaExpr
+    steps: int
+    trace: list[tuple[ReductionType, LambdaExpr]] | None
+
+
+class StepLimitExceeded(ResourceLimitExceeded):
+    '''raised when a term does not reach a normal form within the step budget'''
+
+    def __init__(self, max_steps: int, result: Normalization | None = None):
+        super().__init__('steps', max_steps, f'no normal form within {max_steps} steps')
+        self.max_steps = max_steps
+        # how far the reduction got, when it can be read back
+        self.result = result
+
+
+def find_redex(expr: LambdaExpr, strategy: Strategy = 'normal') -> tuple[App, Link] | None:
+    '''finds the redex the strategy reduces next, with the link to its parent
+
+    normal picks the leftmost outermost redex and head only the redex at the head of the term, if there is one.
+    applicative reduces the argument of a redex before the redex, like call by value, but does not look
+    inside its function, so it picks the leftmost redex whose argument has no redex left.
+    '''
+    stack: list[tuple[LambdaExpr, Link, bool]] = [(expr, None, False)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node, link, inner_done = stack.pop()
+        match node:
+            case Fun(_, body):
+                stack.append((body, (node, 'body', link), False))
+            case App(Fun(), arg):
+                if strategy != 'applicative' or inner_done:
+                    return node, link
+                # revisited once nothing in the argument could be reduced
+                stack.append((node, link, True))
+                stack.append((arg, (node, 'arg', link), False))
+            case App(fun, arg):
+                if strategy != 'head':
+                    stack.append((arg, (node, 'arg', link), False))
+                stack.append((fun, (node, 'fun', link), False))
+    return None
+
+
+def normalize(
+        expr: LambdaExpr,
+        strategy: Strategy = 'normal',
+        max_steps: int | None = 10_000,
+        trace: bool = False) -> Normalization:
+    '''reduces expr with the given strategy until no redex is left for it
+
+    only the chosen redex is reduced at each step, alpha renamings count as steps like in all_beta_reductions.
+    raises StepLimitExceeded if there are more than max_steps steps.
+    '''
+    steps = 0
+    trace_: list[tuple[ReductionType, LambdaExpr]] | None = [] if trace else None
+    while (found := find_redex(expr, strategy)) is not None:
+        if max_steps is not None and steps >= max_steps:
+            raise StepLimitExceeded(max_steps, Normalization(expr, steps, trace_))
+        redex, link = found
+        fun = redex.fun
+        if len(fun.args) > 1:
+            # the other arguments are binders in the body, so reduce_redex renames them if they would capture
+            fun = Fun(fun.args[:1], Fun(fun.args[1:], fun.body))
+        # bindings outside the redex do not matter to reducing it
+        reduction_type, reduced = reduce_redex(fun, redex.arg)
+        expr = _plug(reduced, link)
+        steps += 1
+        if trace_ is not None:
+            trace_.append((reduction_type, expr))
+    return Normalization(expr, steps, trace_)
+
+
 def return_reducs_only(beta_reduc: Generator) -> List[LambdaExpr]:
     reduc_list = [reduc for (_, reduc) in beta_reduc]
     return reduc_list
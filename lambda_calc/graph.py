@@ -0,0 +1,222 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+from .ast import DBTerm, LambdaExpr, free_names, to_debruijn
+from .core import Path, contract_at, redex_paths
+
+__all__ = ['ReductionGraph', 'Edge', 'explore', 'reduction_path']
+
+
+class Edge(NamedTuple):
+    '''a beta reduction of the redex at path, alpha if the redex had to be renamed first'''
+    target: int
+    path: Path
+    alpha: bool
+
+
+def _expand(expr: LambdaExpr) -> list[tuple[Path, bool, LambdaExpr]]:
+    '''the one step beta reductions of expr in the order of all_beta_reductions, with alpha renamings applied'''
+    steps = []
+    for path in redex_paths(expr):
+        reduction_type, reduced = contract_at(expr, path)
+        steps.append((path, reduction_type == 'alpha', reduced))
+    return steps
+
+
+class ReductionGraph:
+    '''the terms reachable from a term by beta reductions, one node per alpha equivalence class
+
+    nodes are numbered in breadth first order from the root 0 and keep the first term found of their class,
+    which is a reduct of the term of its parent. edges of a node are in the order of all_beta_reductions.
+    the graph is complete if every reachable term was expanded within the budgets.
+    '''
+
+    def __init__(self, root: LambdaExpr):
+        self.nodes: list[LambdaExpr] = [root]
+        self.depths: list[int] = [0]
+        self.parents: list[int | None] = [None]
+        # None until the node is expanded
+        self.edges: list[list[Edge] | None] = [None]
+        # expanded nodes with reducts left out for the node budget
+        self.partial: set[int] = set()
+        self.complete = False
+        self._ids: dict[DBTerm, int] = {to_debruijn(root): 0}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def find(self, expr: LambdaExpr) -> int | None:
+        '''the node of the alpha equivalence class of expr'''
+        return self._ids.get(to_debruijn(expr))
+
+    def _add(self, expr: LambdaExpr, key: DBTerm, parent: int) -> int:
+        self._ids[key] = len(self.nodes)
+        self.nodes.append(expr)
+        self.depths.append(self.depths[parent] + 1)
+        self.parents.append(parent)
+        self.edges.append(None)
+        return len(self.nodes) - 1
+
+    @property
+    def normal_forms(self) -> list[int]:
+        '''expanded nodes without reductions'''
+        return [node for node, edges in enumerate(self.edges) if edges == [] and node not in self.partial]
+
+    def has_normal_form(self) -> bool | None:
+        '''whether a normal form is reachable, None if none was found in an incomplete graph'''
+        if self.normal_forms:
+            return True
+        return False if self.complete else None
+
+    def shortest_path(self, target: int | None = None) -> list[int] | None:
+        '''nodes on a shortest path from the root to target, by default to the closest normal form
+
+        terms along the path are reducts of each other, alpha renamings are on the edges.
+        None if target is not reachable in the graph.
+        '''
+        if target is None:
+            target = min(self.normal_forms, key=self.depths.__getitem__, default=None)
+            if target is None:
+                return None
+        path = []
+        node: int | None = target
+        while node is not None:
+            path.append(node)
+            node = self.parents[node]
+        return path[::-1]
+
+    def longest_path(self, target: int | None = None) -> list[int] | None:
+        '''nodes on a longest path from the root to target in the graph, by default to any normal form
+
+        consecutive terms are reducts of each other up to alpha equivalence.
+        raises ValueError if a cycle leads to target, then paths to it are unbounded.
+        '''
+        targets = set(self.normal_forms) if target is None else {target}
+        if not targets:
+            return None
+        # the nodes that lead to a target
+        predecessors: list[list[int]] = [[] for _ in self.nodes]
+        for node, edges in enumerate(self.edges):
+            for edge in edges or ():
+                predecessors[edge.target].append(node)
+        relevant = set(targets)
+        stack = list(targets)
+        while stack:
+            for node in predecessors[stack.pop()]:
+                if node not in relevant:
+                    relevant.add(node)
+                    stack.append(node)
+        # topological order of the relevant nodes, longest distances from the root along the way
+        incoming = {node: sum(pred in relevant for pred in predecessors[node]) for node in relevant}
+        ready = [node for node, count in incoming.items() if count == 0]
+        distance = {0: 0}
+        previous: dict[int, int] = {}
+        visited = 0
+        while ready:
+            node = ready.pop()
+            visited += 1
+            for edge in self.edges[node] or ():
+                if edge.target not in relevant:
+                    continue
+                if node in distance and distance[node] + 1 > distance.get(edge.target, -1):
+                    distance[edge.target] = distance[node] + 1
+                    previous[edge.target] = node
+                incoming[edge.target] -= 1
+                if incoming[edge.target] == 0:
+                    ready.append(edge.target)
+        if visited < len(relevant):
+            raise ValueError('a cycle leads to the target, paths to it are unbounded')
+        end = max((node for node in targets if node in distance), key=distance.__getitem__)
+        path = [end]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+
+def _expansions(exprs: list[LambdaExpr], executor: ProcessPoolExecutor | None,
+                chunksize: int) -> Iterable[list[tuple[Path, bool, LambdaExpr]]]:
+    if executor is None:
+        return map(_expand, exprs)
+    return executor.map(_expand, exprs, chunksize=chunksize)
+
+
+def _levels(graph: ReductionGraph, max_depth: int | None) -> Iterator[list[int]]:
+    frontier = [0]
+    while frontier and (max_depth is None or graph.depths[frontier[0]] < max_depth):
+        yield frontier
+        frontier = [node for node in range(frontier[-1] + 1, len(graph)) if graph.edges[node] is None]
+
+
+def explore(
+        expr: LambdaExpr,
+        max_depth: int | None = None,
+        max_nodes: int | None = 10_000,
+        workers: int | None = 1,
+        chunksize: int = 16) -> ReductionGraph:
+    '''builds the reduction graph of expr breadth first, up to max_depth reductions and max_nodes nodes
+
+    alpha equivalent reducts share a node, so every class is expanded once.
+    each level of the frontier is expanded on a pool of workers processes, None for the number of processors;
+    with workers=1 everything runs in this process.
+    '''
+    graph = ReductionGraph(expr)
+    executor = ProcessPoolExecutor(workers) if workers != 1 else None
+    try:
+        for frontier in _levels(graph, max_depth):
+            for node, steps in zip(frontier, _expansions([graph.nodes[node] for node in frontier], executor, chunksize)):
+                edges = graph.edges[node] = []
+                for path, alpha, reduced in steps:
+                    key = to_debruijn(reduced)
+                    target = graph._ids.get(key)
+                    if target is None:
+                        if max_nodes is not None and len(graph) >= max_nodes:
+                            graph.partial.add(node)
+                            continue
+                        target = graph._add(reduced, key, node)
+                    edges.append(Edge(target, path, alpha))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    graph.complete = not graph.partial and all(edges is not None for edges in graph.edges)
+    return graph
+
+
+def reduction_path(
+        expr: LambdaExpr,
+        target: LambdaExpr,
+        max_steps: int,
+        max_nodes: int | None = 10_000) -> list[LambdaExpr] | None:
+    '''the terms after every beta reduction of a shortest path from expr to a term alpha equivalent to target
+
+    searches breadth first over alpha equivalence classes, up to max_steps reductions and max_nodes classes.
+    reductions never add free variables, so terms missing one of target are not expanded.
+    None if no such path was found within the budgets.
+    '''
+    goal = to_debruijn(target)
+    needed = free_names(target)
+    # the class each class was first reached from, with the term it was reached as
+    parents: dict[DBTerm, tuple[DBTerm | None, LambdaExpr]] = {to_debruijn(expr): (None, expr)}
+    if goal in parents:
+        return []
+    frontier = [expr]
+    for _ in range(max_steps):
+        next_frontier = []
+        for node in frontier:
+            if not needed <= free_names(node):
+                continue
+            for _, _, reduced in _expand(node):
+                key = to_debruijn(reduced)
+                if key in parents:
+                    continue
+                parents[key] = (to_debruijn(node), reduced)
+                if key is goal:
+                    path = []
+                    step: DBTerm | None = key
+                    while step is not None:
+                        step, term = parents[step]
+                        path.append(term)
+                    return path[-2::-1]
+                if max_nodes is not None and len(parents) >= max_nodes:
+                    return None
+                next_frontier.append(reduced)
+        frontier = next_frontier
+    return None
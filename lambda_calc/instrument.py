@@ -0,0 +1,71 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterator, ParamSpec, TypeVar
+
+__all__ = ['Stats', 'stats', 'profile_stats']
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+
+class Stats:
+    '''counters and timings collected inside a stats() block
+
+    counts are events like nodes allocated or redexes enumerated, times the total seconds spent in
+    timed functions and samples the duration of every call of them, e.g. the parse time of each line
+    '''
+
+    def __init__(self):
+        self.counts: Counter[str] = Counter()
+        self.times: defaultdict[str, float] = defaultdict(float)
+        self.samples: defaultdict[str, list[float]] = defaultdict(list)
+
+    def record(self, name: str, seconds: float):
+        self.times[name] += seconds
+        self.samples[name].append(seconds)
+
+    def __str__(self) -> str:
+        lines = [f'{name:<24}{count:>12}' for name, count in sorted(self.counts.items())]
+        lines += [f'{name:<24}{len(self.samples[name]):>12} calls{seconds * 1e3:>12.3f} ms'
+                  for name, seconds in sorted(self.times.items(), key=lambda item: -item[1])]
+        return '\n'.join(lines)
+
+
+# the stats being collected, checked before recording anything so nothing is done outside of a block
+active: Stats | None = None
+
+
+@contextmanager
+def stats() -> Iterator[Stats]:
+    '''collects counters and timings of the code run inside the block, blocks can be nested
+
+    collection is global to the process, not to a thread
+    '''
+    global active
+    outer, active = active, Stats()
+    try:
+        yield active
+    finally:
+        active = outer
+
+
+profile_stats = stats
+
+
+def timed(name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    '''records the duration of every call of the decorated function under name while collecting stats'''
+    def decorate(fn: Callable[P, R]) -> Callable[P, R]:
+        @wraps(fn)
+        def timed_fn(*args: P.args, **kwargs: P.kwargs) -> R:
+            collecting = active
+            if collecting is None:
+                return fn(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                collecting.record(name, perf_counter() - start)
+        return timed_fn
+    return decorate
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator
+from time import perf_counter
+
+__all__ = ['Governor', 'ResourceLimitExceeded']
+
+
+class ResourceLimitExceeded(Exception):
+    '''raised when work runs over a limit, limit names which one and value is the limit itself'''
+
+    def __init__(self, limit: str, value: float, message: str | None = None):
+        super().__init__(message or f'{limit} limit of {value} exceeded')
+        self.limit = limit
+        self.value = value
+
+
+class Governor:
+    '''limits the work of the traversals and reductions run inside `with governor:`
+
+    fuel is the number of redexes reduced, max_nodes the number of nodes visited or built by traversals
+    and timeout the seconds since entering. counts start over every time the governor is entered,
+    unless it is already the current one, then the outer block keeps counting.
+    '''
+    __slots__ = ('fuel', 'max_nodes', 'timeout', 'steps', 'nodes', '_deadline', '_tokens')
+
+    def __init__(self, fuel: int | None = None, max_nodes: int | None = None, timeout: float | None = None):
+        self.fuel = fuel
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.steps = 0
+        self.nodes = 0
+        self._deadline: float | None = None
+        self._tokens: list[Token] = []
+
+    def __reduce__(self):
+        # only the limits, a copy in another process counts on its own
+        return Governor, (self.fuel, self.max_nodes, self.timeout)
+
+    def __enter__(self) -> 'Governor':
+        if _current.get() is not self:
+            self.reset()
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *_):
+        _current.reset(self._tokens.pop())
+
+    def reset(self):
+        '''starts the counts and the clock over'''
+        self.steps = self.nodes = 0
+        self._deadline = perf_counter() + self.timeout if self.timeout is not None else None
+
+    @contextmanager
+    def resumed(self) -> Iterator['Governor']:
+        '''makes the governor current without starting over, for work done in parts like the lines of a candidate'''
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def charge(self, steps: int = 0, nodes: int = 0, seconds: float = 0.0):
+        '''counts work done elsewhere on behalf of the work inside, like preparing something it shares'''
+        self.steps += steps
+        self.nodes += nodes
+        if self._deadline is not None:
+            self._deadline -= seconds
+        if self.fuel is not None and self.steps > self.fuel:
+            raise ResourceLimitExceeded('fuel', self.fuel)
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise ResourceLimitExceeded('nodes', self.max_nodes)
+        self._check_time()
+
+    def step(self):
+        '''counts a reduction'''
+        self.steps += 1
+        if self.fuel is not None and self.steps > self.fuel:
+            raise ResourceLimitExceeded('fuel', self.fuel)
+        self._check_time()
+
+    def visit(self):
+        '''counts a node, the clock is only read every 1024 of them'''
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise ResourceLimitExceeded('nodes', self.max_nodes)
+        if not self.nodes & 1023:
+            self._check_time()
+
+    def _check_time(self):
+        if self._deadline is not None and perf_counter() > self._deadline:
+            raise ResourceLimitExceeded('timeout', self.timeout)
+
+
+_current: ContextVar[Governor | None] = ContextVar('governor', default=None)
+
+
+def current() -> Governor | None:
+    '''the governor of the innermost `with governor:` block, traversals look it up once when they start'''
+    return _current.get()
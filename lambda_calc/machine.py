@@ -0,0 +1,333 @@
+from typing import Literal, NamedTuple, TypeAlias
+from .ast import DBApp, DBFree, DBLam, DBTerm, DBVar, LambdaExpr, from_debruijn, to_debruijn
+from .core import StepLimitExceeded
+
+__all__ = ['krivine', 'cek', 'lazy', 'evaluate', 'Evaluation']
+
+
+class Closure:
+    '''a term together with the values of its free de Bruijn indices'''
+    __slots__ = ('term', 'env')
+    __match_args__ = ('term', 'env')
+
+    def __init__(self, term: DBTerm, env: 'Env'):
+        self.term = term
+        self.env = env
+
+
+class Thunk(Closure):
+    '''an argument passed by need, updated with its value the first time it is evaluated'''
+    __slots__ = ('value',)
+
+    def __init__(self, term: 'DBTerm | None', env: 'Env', value: 'Value | None' = None):
+        super().__init__(term, env)
+        self.value = value
+
+
+class Neutral:
+    '''a variable that cannot be reduced, applied to some arguments
+
+    head is the name of a free variable, or the depth of the binder it refers to while reading back
+    '''
+    __slots__ = ('head', 'args')
+    __match_args__ = ('head', 'args')
+
+    def __init__(self, head: str | int, args: tuple['Value', ...] = ()):
+        self.head = head
+        self.args = args
+
+
+Value: TypeAlias = Closure | Neutral
+# linked list of values, the innermost binder first
+Env: TypeAlias = 'tuple[Value, Env] | None'
+Strategy: TypeAlias = Literal["name"] | Literal["value"] | Literal["need"]
+
+
+class Evaluation(NamedTuple):
+    expr: LambdaExpr
+    steps: int
+    allocated: int
+    shared: int
+
+
+def _lookup(env: Env, index: int) -> Value:
+    for _ in range(index):
+        env = env[1]
+    return env[0]
+
+
+class _Krivine:
+    '''call by name, arguments are passed as unevaluated closures'''
+    # whether arguments of neutral values still have to be evaluated when reading back
+    forces_args = True
+
+    def __init__(self, max_steps: int | None):
+        self.steps = 0
+        self.max_steps = max_steps
+        self.allocated = 0
+        self.shared = 0
+        # read back terms of shared arguments, by argument and depth
+        self.memo: dict[tuple[int, int], tuple[Value, DBTerm]] | None = None
+
+    def tick(self):
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise StepLimitExceeded(self.max_steps)
+
+    def bind(self, depth: int) -> Value:
+        '''the value of a binder while reading back under it'''
+        return Neutral(depth)
+
+    def force(self, arg: Value) -> Value:
+        return self.run(arg.term, arg.env)
+
+    def run(self, term: DBTerm, env: Env) -> Value:
+        '''evaluates term to weak head normal form'''
+        # arguments of the applications on the way down, the next one on top
+        stack: list[Value] = []
+        while True:
+            match term:
+                case DBApp(fun, arg):
+                    stack.append(Closure(arg, env))
+                    term = fun
+                case DBLam(body):
+                    if not stack:
+                        return Closure(term, env)
+                    self.tick()
+                    env = (stack.pop(), env)
+                    term = body
+                case DBVar(index):
+                    value = _lookup(env, index)
+                    if isinstance(value, Neutral):
+                        return Neutral(value.head, value.args + tuple(reversed(stack)))
+                    term, env = value.term, value.env
+                case DBFree(name):
+                    return Neutral(name, tuple(reversed(stack)))
+
+
+class _CEK(_Krivine):
+    '''call by value, arguments are evaluated before they are passed'''
+    forces_args = False
+
+    def run(self, term: DBTerm, env: Env) -> Value:
+        '''evaluates term to a value'''
+        # ('arg', term, env) evaluates an argument next, ('fun', value) applies a function to the result
+        konts: list[tuple] = []
+        while True:
+            match term:
+                case DBApp(fun, arg):
+                    konts.append(('arg', arg, env))
+                    term = fun
+                    continue
+                case DBLam():
+                    value = Closure(term, env)
+                case DBVar(index):
+                    value = _lookup(env, index)
+                case DBFree(name):
+                    value = Neutral(name)
+            while True:
+                if not konts:
+                    return value
+                kont = konts.pop()
+                if kont[0] == 'arg':
+                    konts.append(('fun', value))
+                    _, term, env = kont
+                    break
+                fun = kont[1]
+                if isinstance(fun, Neutral):
+                    value = Neutral(fun.head, fun.args + (value,))
+                    continue
+                self.tick()
+                term, env = fun.term.body, (value, fun.env)
+                break
+
+
+class _Lazy(_Krivine):
+    '''call by need, every argument is one heap cell that is updated with its value when it is first needed
+
+    this is graph reduction with the environment as the graph: a variable used many times points to the same
+    thunk, so its argument is evaluated (and read back) once instead of being copied into every occurrence
+    '''
+
+    def __init__(self, max_steps: int | None):
+        super().__init__(max_steps)
+        self.memo = {}
+
+    def bind(self, depth: int) -> Thunk:
+        self.allocated += 1
+        return Thunk(None, None, Neutral(depth))
+
+    def force(self, arg: Thunk) -> Value:
+        if arg.value is None:
+            return self.run(arg.term, arg.env, arg)
+        self.shared += 1
+        return arg.value
+
+    def run(self, term: DBTerm, env: Env, thunk: Thunk | None = None) -> Value:
+        '''evaluates term to weak head normal form, updating thunk and every thunk forced on the way'''
+        # argument thunks, the next one on top, and the thunks (as 1-tuples) waiting for the value below them
+        stack: list[Thunk | tuple[Thunk]] = [(thunk,)] if thunk is not None else []
+        value: Value | None = None
+        while True:
+            if value is None:
+                match term:
+                    case DBApp(fun, arg):
+                        self.allocated += 1
+                        stack.append(Thunk(arg, env))
+                        term = fun
+                        continue
+                    case DBLam(body):
+                        if stack and not isinstance(stack[-1], tuple):
+                            self.tick()
+                            env = (stack.pop(), env)
+                            term = body
+                            continue
+                        self.allocated += 1
+                        value = Closure(term, env)
+                    case DBVar(index):
+                        thunk = _lookup(env, index)
+                        if thunk.value is None:
+                            stack.append((thunk,))
+                            term, env = thunk.term, thunk.env
+                            continue
+                        self.shared += 1
+                        value = thunk.value
+                    case DBFree(name):
+                        self.allocated += 1
+                        value = Neutral(name)
+            # the value is either applied to the arguments on top of the stack or updates the thunk there
+            if not stack:
+                return value
+            if isinstance(stack[-1], tuple):
+                stack.pop()[0].value = value
+                continue
+            if isinstance(value, Neutral):
+                args = []
+                while stack and not isinstance(stack[-1], tuple):
+                    args.append(stack.pop())
+                self.allocated += 1
+                value = Neutral(value.head, value.args + tuple(args))
+                continue
+            term, env = value.term, value.env
+            value = None
+
+
+def _read_back(value: Value, machine: _Krivine) -> DBTerm:
+    '''converts a value back into a normal form, evaluating under binders'''
+    results: list[DBTerm] = []
+    memo = machine.memo
+    # ('value', value, depth), ('arg', argument, depth), ('memo', key, argument), ('lam',) or ('app', head, arity)
+    tasks: list[tuple] = [('value', value, 0)]
+    while tasks:
+        task = tasks.pop()
+        match task:
+            case ('arg', arg, depth):
+                if memo is not None:
+                    key = (id(arg), depth)
+                    if key in memo:
+                        machine.shared += 1
+                        results.append(memo[key][1])
+                        continue
+                    tasks.append(('memo', key, arg))
+                tasks.append(('value', machine.force(arg) if machine.forces_args else arg, depth))
+            case ('memo', key, arg):
+                # the argument is kept alive with its result, so its id is not reused
+                memo[key] = (arg, results[-1])
+            case ('value', Closure(lam, env), depth):
+                tasks.append(('lam',))
+                tasks.append(('value', machine.run(lam.body, (machine.bind(depth), env)), depth + 1))
+            case ('value', Neutral(head, args), depth):
+                head_term = DBFree(head) if isinstance(head, str) else DBVar(depth - head - 1)
+                tasks.append(('app', head_term, len(args)))
+                for arg in reversed(args):
+                    tasks.append(('arg', arg, depth))
+            case ('lam',):
+                results.append(DBLam(results.pop()))
+            case ('app', head_term, n):
+                args_ = results[len(results) - n:]
+                del results[len(results) - n:]
+                term = head_term
+                for arg_ in args_:
+                    term = DBApp(term, arg_)
+                results.append(term)
+    return results[0]
+
+
+def _unload(value: Value) -> DBTerm:
+    '''converts a value back into a term without reducing it any further'''
+    results: list[DBTerm] = []
+    # ('term', term, env, depth) unloads a term under depth binders of its own, ('lam',) and ('app',) combine results
+    tasks: list[tuple] = [('value', value, 0)]
+    while tasks:
+        task = tasks.pop()
+        match task:
+            case ('value', Thunk() as thunk, depth) if thunk.value is not None:
+                tasks.append(('value', thunk.value, depth))
+            case ('value', Closure(term, env), depth):
+                tasks.append(('term', term, env, depth))
+            case ('value', Neutral(head, args), depth):
+                # only free variables are neutral, since evaluation never goes under binders here
+                for arg in reversed(args):
+                    tasks.append(('app',))
+                    tasks.append(('value', arg, depth))
+                tasks.append(('done', DBFree(head)))
+            case ('term', DBVar(index), env, depth):
+                if index < depth:
+                    results.append(DBVar(index))
+                else:
+                    # values of the environment are closed apart from free variables, so no shifting is needed
+                    tasks.append(('value', _lookup(env, index - depth), depth))
+            case ('term', DBFree() as free, _, _):
+                results.append(free)
+            case ('term', DBLam(body), env, depth):
+                tasks.append(('lam',))
+                tasks.append(('term', body, env, depth + 1))
+            case ('term', DBApp(fun, arg), env, depth):
+                tasks.append(('app',))
+                tasks.append(('term', arg, env, depth))
+                tasks.append(('term', fun, env, depth))
+            case ('done', term):
+                results.append(term)
+            case ('lam',):
+                results.append(DBLam(results.pop()))
+            case ('app',):
+                arg_ = results.pop()
+                results.append(DBApp(results.pop(), arg_))
+    return results[0]
+
+
+_machines: dict[str, type[_Krivine]] = {'name': _Krivine, 'value': _CEK, 'need': _Lazy}
+
+
+def _evaluate(expr: LambdaExpr, strategy: Strategy, full: bool, max_steps: int | None) -> Evaluation:
+    machine = _machines[strategy](max_steps)
+    value = machine.run(to_debruijn(expr), None)
+    term = _read_back(value, machine) if full else _unload(value)
+    return Evaluation(from_debruijn(term), machine.steps, machine.allocated, machine.shared)
+
+
+def evaluate(expr: LambdaExpr, strategy: Strategy = 'name', full: bool = True,
+             max_steps: int | None = None) -> LambdaExpr:
+    '''evaluates expr on an environment machine instead of rewriting it
+
+    'name' runs a Krivine machine (call by name), 'value' a CEK machine (call by value)
+    and 'need' a Krivine machine that shares evaluated arguments (call by need).
+    full reads the result back into a normal form, otherwise only the weak head normal form or value is returned.
+    raises StepLimitExceeded after max_steps beta steps.
+    '''
+    return _evaluate(expr, strategy, full, max_steps).expr
+
+
+def krivine(expr: LambdaExpr, full: bool = True, max_steps: int | None = None) -> LambdaExpr:
+    '''evaluates expr by name on a Krivine machine'''
+    return evaluate(expr, 'name', full, max_steps)
+
+
+def cek(expr: LambdaExpr, full: bool = True, max_steps: int | None = None) -> LambdaExpr:
+    '''evaluates expr by value on a CEK machine'''
+    return evaluate(expr, 'value', full, max_steps)
+
+
+def lazy(expr: LambdaExpr, full: bool = True, max_steps: int | None = None) -> Evaluation:
+    '''evaluates expr by need, counting the beta steps, allocated heap cells and reuses of shared ones'''
+    return _evaluate(expr, 'need', full, max_steps)
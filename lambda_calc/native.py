@@ -0,0 +1,110 @@
+from functools import lru_cache
+from itertools import count
+from types import CodeType
+from typing import Any, Callable
+from .ast import App, DBApp, DBFree, DBLam, DBTerm, DBVar, Fun, LambdaExpr, Var, to_debruijn
+
+__all__ = ['compile_closure', 'church_to_int', 'church_to_bool']
+
+
+def _free_name(name: str) -> str:
+    '''python name of a free variable, primes are not allowed in identifiers'''
+    return name.replace("'", '_')
+
+
+class _Def:
+    '''statements of a python function being generated for a lambda, level is the depth of its parameter'''
+    __slots__ = ('level', 'statements')
+
+    def __init__(self, level: int):
+        self.level = level
+        self.statements: list[str] = []
+
+
+def _source(term: DBTerm) -> str:
+    '''generates a python function _term returning the closure of term
+
+    applications become assignments to temporaries, so deep terms do not hit the nesting limits of the python parser,
+    and lambdas become nested functions whose parameters are named by depth
+    '''
+    names = count()
+    top = _Def(-1)
+    operands: list[str] = []
+    # ('term', term, def), ('app', def) or ('lam', def of the lambda, def around it)
+    tasks: list[tuple] = [('term', term, top)]
+    while tasks:
+        task = tasks.pop()
+        match task:
+            case ('term', DBVar(index), fun):
+                operands.append(f'v{fun.level - index}')
+            case ('term', DBFree(name), _):
+                operands.append(_free_name(name))
+            case ('term', DBApp(fun_, arg), fun):
+                tasks.append(('app', fun))
+                tasks.append(('term', arg, fun))
+                tasks.append(('term', fun_, fun))
+            case ('term', DBLam(body), fun):
+                inner = _Def(fun.level + 1)
+                tasks.append(('lam', inner, fun))
+                tasks.append(('term', body, inner))
+            case ('app', fun):
+                arg_ = operands.pop()
+                name = f't{next(names)}'
+                fun.statements.append(f'{name} = {operands.pop()}({arg_})')
+                operands.append(name)
+            case ('lam', inner, fun):
+                inner.statements.append(f'return {operands.pop()}')
+                name = f'f{next(names)}'
+                fun.statements.append(f'def {name}(v{inner.level}):')
+                fun.statements.extend('    ' + statement for statement in inner.statements)
+                operands.append(name)
+    top.statements.append(f'return {operands.pop()}')
+    return 'def _term():\n' + ''.join(f'    {statement}\n' for statement in top.statements)
+
+
+@lru_cache(maxsize=1024)
+def _code(term: DBTerm) -> CodeType:
+    '''compiled code by de Bruijn term, so alpha equivalent expressions share it'''
+    return compile(_source(term), '<lambda_calc>', 'exec')
+
+
+def _run(term: DBTerm, namespace: dict[str, Any]) -> Any:
+    exec(_code(term), namespace)
+    return namespace['_term']()
+
+
+@lru_cache(maxsize=1024)
+def _closed(term: DBTerm) -> Any:
+    '''closed terms do not depend on the values of free variables, so their closures are shared as well'''
+    return _run(term, {})
+
+
+def compile_closure(expr: LambdaExpr, **free: Any) -> Any:
+    '''compiles expr into a python closure, evaluated by value like any python call
+
+    free variables are looked up in free, by their names with primes replaced by underscores.
+    '''
+    term = to_debruijn(expr)
+    if not term.free:
+        return _closed(term)
+    return _run(term, {_free_name(name): value for name, value in free.items()})
+
+
+def _closure(expr: LambdaExpr | Callable) -> Callable:
+    return compile_closure(expr) if isinstance(expr, (Var, Fun, App)) else expr
+
+
+def church_to_int(expr: LambdaExpr | Callable) -> int:
+    '''decodes a Church numeral λfx.f(...(fx)) by counting the applications of f'''
+    result = _closure(expr)(lambda n: n + 1)(0)
+    if not isinstance(result, int):
+        raise ValueError('not a Church numeral')
+    return result
+
+
+def church_to_bool(expr: LambdaExpr | Callable) -> bool:
+    '''decodes a Church boolean λxy.x or λxy.y by choosing between True and False'''
+    result = _closure(expr)(True)(False)
+    if not isinstance(result, bool):
+        raise ValueError('not a Church boolean')
+    return result
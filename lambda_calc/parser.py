@@ -1,9 +1,12 @@
 from functools import partial, reduce
 from parsy import Parser, forward_declaration, generate, fail, regex, string, seq
+import parsy
+import re
 from .ast import LambdaExpr, Var, Fun, App
+from . import instrument
 from typing import Callable
 
-__all__ = ['parse']
+__all__ = ['parse', 'parse_combinator', 'ParseError']
 
 ws = regex(r'\s*').desc('whitespace')
 def lexeme(p: Parser) -> Parser: return p << ws
@@ -39,4 +42,87 @@ lambda_expr.become(ws >> (
     | abstraction
 ))
 
-parse: Callable[[str], LambdaExpr] = lambda_expr.parse
+# the parsy grammar above, kept as the reference the hand written parser below is checked against
+parse_combinator: Callable[[str], LambdaExpr] = lambda_expr.parse
+
+
+class ParseError(parsy.ParseError):
+    '''a parse failure, line and column count from 1'''
+
+    def __init__(self, expected: str | list[str], stream: str, index: int):
+        super().__init__(frozenset([expected] if isinstance(expected, str) else expected), stream, index)
+        line, column = parsy.line_info_at(stream, index)
+        self.line = line + 1
+        self.column = column + 1
+
+    def line_info(self) -> str:
+        return f'line {self.line}, column {self.column}'
+
+
+# optional whitespace, then a variable or one of the single character tokens
+_token = re.compile(r"\s*(?:([a-z]'*)|([λ\\L.()]))")
+_space = re.compile(r'\s*')
+_item = ['function', 'left paren', 'variable']
+
+
+@instrument.timed('parse')
+def parse(text: str) -> LambdaExpr:
+    '''parses text into the same tree as parse_combinator, in a single pass without recursion'''
+    # open groups, innermost last: [args of the function or None for parens and the whole text, application so far]
+    groups: list[list] = [[None, None]]
+    parens = 0
+    index = 0
+
+    def add(item: LambdaExpr):
+        group = groups[-1]
+        group[1] = item if group[1] is None else App(group[1], item)
+
+    def close_functions(at: int):
+        # a function body extends as far as possible, so functions end with the group around them
+        while groups[-1][0]:
+            args, body = groups.pop()
+            if body is None:
+                raise ParseError(_item, text, at)
+            add(Fun(args, body))
+
+    while True:
+        match = _token.match(text, index)
+        if match is None:
+            end = _space.match(text, index).end()
+            if end < len(text):
+                raise ParseError(_item + ['right paren' if parens else 'EOF'], text, end)
+            close_functions(end)
+            if groups[-1][1] is None:
+                raise ParseError(_item, text, end)
+            if parens:
+                raise ParseError(_item + ['right paren'], text, end)
+            return groups[0][1]
+        name, token = match.groups()
+        start = match.start(1 if name else 2)
+        index = match.end()
+        if name:
+            add(Var(name))
+        elif token == '(':
+            parens += 1
+            groups.append([None, None])
+        elif token == ')':
+            close_functions(start)
+            if not parens or groups[-1][1] is None:
+                raise ParseError(_item if parens else ['EOF'] + _item, text, start)
+            parens -= 1
+            add(groups.pop()[1])
+        elif token == '.':
+            raise ParseError(_item, text, start)
+        else:
+            args: list[Var] = []
+            while (match := _token.match(text, index)) and match.group(1):
+                args.append(Var(match.group(1)))
+                index = match.end()
+            if not args:
+                raise ParseError('variable', text, _space.match(text, index).end())
+            if not match or match.group(2) != '.':
+                raise ParseError(['dot', 'variable'], text, _space.match(text, index).end())
+            if len({arg.name for arg in args}) != len(args):
+                raise ParseError('distinct variable names', text, start)
+            index = match.end()
+            groups.append([args, None])
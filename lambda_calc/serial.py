@@ -0,0 +1,227 @@
+'''a compact binary format for terms, written and read without recursion
+
+a dumped term is a kind byte, a table of names and the nodes in prefix order. every node starts with a varint
+head, value << 2 | tag, so small values and applications take one byte:
+
+    APP    the function, then the argument follow
+    FUN    value is the number of arguments, their name ids follow unless the term is canonical, then the body
+    BOUND  a bound variable, value is its de Bruijn index counting every argument as a binder
+    FREE   a free variable, value is the id of its name
+
+varints are little endian base 128 and names are a varint count of names, each a varint length and utf-8 bytes.
+canonical terms keep no binder names, so alpha equivalent terms dump to the same bytes, which makes them keys.
+'''
+from . import limits
+from .ast import App, DBApp, DBFree, DBLam, DBVar, Fun, LambdaExpr, Var, fresh_names, to_debruijn
+
+__all__ = ['dumps', 'loads', 'loads_from']
+
+APP = 0
+FUN = 1
+BOUND = 2
+FREE = 3
+
+# the kind byte
+_NAMED = 1
+_CANONICAL = 2
+
+
+def _varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class _Names:
+    '''ids of names in order of first use'''
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+
+    def __getitem__(self, name: str) -> int:
+        id_ = self.ids.get(name)
+        if id_ is None:
+            id_ = self.ids[name] = len(self.ids)
+        return id_
+
+    def dump(self, out: bytearray):
+        _varint(out, len(self.ids))
+        for name in self.ids:
+            data = name.encode()
+            _varint(out, len(data))
+            out += data
+
+
+def _dump_named(expr: LambdaExpr, out: bytearray, names: _Names):
+    # name -> depths of the binders currently in scope for it
+    scope: dict[str, list[int]] = {}
+    depth = 0
+    stack: list[LambdaExpr | tuple[Fun]] = [expr]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        node = stack.pop()
+        match node:
+            case Var(name):
+                levels = scope.get(name)
+                _varint(out, (depth - levels[-1] - 1) << 2 | BOUND if levels else names[name] << 2 | FREE)
+            case Fun(args, body):
+                if not args:
+                    raise ValueError('function without arguments')
+                _varint(out, len(args) << 2 | FUN)
+                for arg in args:
+                    _varint(out, names[arg.name])
+                    scope.setdefault(arg.name, []).append(depth)
+                    depth += 1
+                stack.append((node,))
+                stack.append(body)
+            case App(fun, arg):
+                out.append(APP)
+                stack.append(arg)
+                stack.append(fun)
+            case (Fun(args),):
+                for arg in args:
+                    scope[arg.name].pop()
+                depth -= len(args)
+
+
+def _dump_canonical(expr: LambdaExpr, out: bytearray, names: _Names):
+    stack = [to_debruijn(expr)]
+    governor = limits.current()
+    while stack:
+        if governor is not None:
+            governor.visit()
+        match stack.pop():
+            case DBVar(index):
+                _varint(out, index << 2 | BOUND)
+            case DBFree(name):
+                _varint(out, names[name] << 2 | FREE)
+            case DBLam(body):
+                # consecutive binders are one function, like the arguments of λxy.x
+                count = 1
+                while isinstance(body, DBLam):
+                    body = body.body
+                    count += 1
+                _varint(out, count << 2 | FUN)
+                stack.append(body)
+            case DBApp(fun, arg):
+                out.append(APP)
+                stack.append(arg)
+                stack.append(fun)
+
+
+def dumps(expr: LambdaExpr, canonical: bool = False) -> bytes:
+    '''the bytes of expr, loads gives back an equal term
+
+    canonical leaves out the names of binders, alpha equivalent terms give the same bytes
+    and loads gives back a term with the binder names of from_debruijn
+    '''
+    names = _Names()
+    body = bytearray()
+    (_dump_canonical if canonical else _dump_named)(expr, body, names)
+    out = bytearray((_CANONICAL if canonical else _NAMED,))
+    names.dump(out)
+    out += body
+    return bytes(out)
+
+
+def _read_varint(view: memoryview, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def loads_from(data, offset: int = 0) -> tuple[LambdaExpr, int]:
+    '''reads the term dumped at offset of data, which can be bytes, a memoryview or an mmap
+
+    returns the term and the offset after it. the buffer is read in place, only the nodes of the term are built
+    and variables are shared between their occurrences. raises ValueError if the data is not a dumped term
+    '''
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    try:
+        kind = view[offset]
+        if kind not in (_NAMED, _CANONICAL):
+            raise ValueError(f'unknown kind of term {kind}')
+        count, pos = _read_varint(view, offset + 1)
+        table: list[Var] = []
+        for _ in range(count):
+            length, pos = _read_varint(view, pos)
+            if pos + length > len(view):
+                raise IndexError
+            table.append(Var(str(view[pos:pos + length], 'utf-8')))
+            pos += length
+        # canonical binders at depth d take the d-th name not in the table, like from_debruijn
+        supply = fresh_names(var.name for var in table) if kind == _CANONICAL else None
+        depth_vars: list[Var] = []
+        binders: list[Var] = []
+        # functions waiting for their body and applications for their function, a list, or their argument
+        frames: list[tuple[Var, ...] | list[LambdaExpr]] = []
+        governor = limits.current()
+        while True:
+            if governor is not None:
+                governor.visit()
+            head = view[pos]
+            if head < 0x80:
+                pos += 1
+            else:
+                head, pos = _read_varint(view, pos)
+            tag, value = head & 3, head >> 2
+            if tag == APP:
+                frames.append([])
+                continue
+            if tag == FUN:
+                if value == 0:
+                    raise ValueError('function without arguments')
+                if supply is None:
+                    args = []
+                    for _ in range(value):
+                        id_, pos = _read_varint(view, pos)
+                        if id_ >= len(table):
+                            raise ValueError(f'unknown name id {id_}')
+                        args.append(table[id_])
+                else:
+                    while len(depth_vars) < len(binders) + value:
+                        depth_vars.append(Var(next(supply)))
+                    args = depth_vars[len(binders):len(binders) + value]
+                binders.extend(args)
+                frames.append(tuple(args))
+                continue
+            if tag == BOUND:
+                if value >= len(binders):
+                    raise ValueError(f'unbound index {value}')
+                node: LambdaExpr = binders[-value - 1]
+            else:
+                if value >= len(table):
+                    raise ValueError(f'unknown name id {value}')
+                node = table[value]
+            while frames:
+                frame = frames[-1]
+                if type(frame) is list:
+                    if not frame:
+                        frame.append(node)
+                        break
+                    node = App(frame[0], node)
+                else:
+                    del binders[-len(frame):]
+                    node = Fun(frame, node)
+                frames.pop()
+            else:
+                return node, pos
+    except IndexError:
+        raise ValueError('truncated term') from None
+
+
+def loads(data) -> LambdaExpr:
+    '''the term dumped in data, raises ValueError if there is anything after it'''
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    expr, end = loads_from(view)
+    if end != len(view):
+        raise ValueError('data after the term')
+    return expr
@@ -0,0 +1,293 @@
+'''a local grading service, checking candidates sent as JSON lines on a pool of worker processes
+
+every request is a JSON object on its own line, answered by one line with the same id:
+
+    {"id": 1, "candidate": "\\n(λx.x)y\\nb-> y\\n", "initial": "(λx.x)y"}
+    {"id": 1, "errors": []}
+
+"max_steps" is passed on to check_candidate_str. a candidate still being checked at the deadline gets
+{"id": ..., "error": "deadline exceeded"} and its worker is killed and replaced. {"id": ..., "metrics": true}
+is answered right away with the ServiceMetrics of the service. at most queue_size candidates wait for a worker,
+beyond that no more requests are read until one is taken, so clients sending too fast are slowed down.
+
+run with `serve` for JSON lines over stdin and stdout, `serve --socket PATH` or `serve --port PORT`
+to listen on a unix socket or on a port of localhost.
+'''
+from contextlib import nullcontext
+from multiprocessing.connection import Connection
+from typing import Any, Awaitable, Callable, NamedTuple
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+
+from .cache import ReductionCache
+from .limits import Governor
+from .wrapper import check_candidate_str
+
+__all__ = ['GradingService', 'ServiceMetrics', 'main']
+
+
+class ServiceMetrics(NamedTuple):
+    queued: int
+    max_queued: int
+    running: int
+    completed: int
+    timed_out: int
+    failed: int
+    invalid: int
+    restarts: int
+    # total seconds spent checking candidates, and waiting for a worker before
+    busy_seconds: float
+    wait_seconds: float
+
+
+class _Job(NamedTuple):
+    candidate: str
+    initial: str
+    max_steps: int
+    queued_at: float
+    result: asyncio.Future
+
+
+def _serve(connection: Connection, time_limit: float | None):
+    '''checks the candidates sent on connection until it gets None or the service is gone
+
+    keeps a cache of reductions between them, so candidates for the same exercise share it.
+    a candidate taking more than time_limit seconds is stopped with a resource limit error of its line
+    '''
+    cache = ReductionCache()
+    governor = Governor(timeout=time_limit) if time_limit is not None else nullcontext()
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        candidate, initial, max_steps = request
+        try:
+            with governor:
+                errors = check_candidate_str(candidate, initial, cache, max_steps)
+            connection.send(('errors', errors))
+        except Exception as e:
+            connection.send(('error', f'{type(e).__name__}: {e}'))
+
+
+class _Worker:
+    '''a worker process checking one candidate at a time'''
+
+    def __init__(self, context: Any, time_limit: float | None):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, time_limit), daemon=True)
+        self.process.start()
+        child.close()
+
+    async def check(self, candidate: str, initial: str, max_steps: int, timeout: float) -> tuple[str, Any]:
+        '''raises TimeoutError if there is no answer within timeout seconds'''
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        self.connection.send((candidate, initial, max_steps))
+        fd = self.connection.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait_for(readable, timeout)
+        finally:
+            loop.remove_reader(fd)
+        return self.connection.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class GradingService:
+    '''checks candidates on workers processes, None for the number of processors, each within deadline seconds
+
+    with a time_limit, workers stop candidates running longer themselves, answering with a resource limit error
+    of the line and keeping the worker, so only candidates stuck outside of the reductions reach the deadline.
+    use it with `async with`, which starts the workers and stops them at the end.
+    '''
+
+    def __init__(self, workers: int | None = None, deadline: float = 5.0, queue_size: int = 64,
+                 time_limit: float | None = None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.deadline = deadline
+        self.time_limit = time_limit
+        self.queue_size = queue_size
+        # spawned rather than forked, the service reads from threads and forking them is not safe
+        self._context = multiprocessing.get_context('spawn')
+        self._queue: asyncio.Queue[_Job] = asyncio.Queue(queue_size)
+        self._pool: list[_Worker] = []
+        self._tasks: list[asyncio.Task] = []
+        self.max_queued = self.running = self.completed = self.timed_out = self.failed = self.invalid = 0
+        self.restarts = 0
+        self.busy_seconds = self.wait_seconds = 0.0
+
+    async def __aenter__(self) -> 'GradingService':
+        loop = asyncio.get_running_loop()
+        self._pool = await asyncio.gather(*(loop.run_in_executor(None, _Worker, self._context, self.time_limit)
+                                            for _ in range(self.workers)))
+        self._tasks = [asyncio.create_task(self._dispatch(slot)) for slot in range(self.workers)]
+        return self
+
+    async def __aexit__(self, *_):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for worker in self._pool:
+            worker.close()
+
+    @property
+    def metrics(self) -> ServiceMetrics:
+        return ServiceMetrics(self._queue.qsize(), self.max_queued, self.running, self.completed, self.timed_out,
+                              self.failed, self.invalid, self.restarts, self.busy_seconds, self.wait_seconds)
+
+    async def submit(self, candidate: str, initial: str, max_steps: int = 1) -> asyncio.Future:
+        '''queues a candidate, waiting while the queue is full, and returns the future of its response'''
+        result = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Job(candidate, initial, max_steps, time.perf_counter(), result))
+        self.max_queued = max(self.max_queued, self._queue.qsize())
+        return result
+
+    async def check(self, candidate: str, initial: str, max_steps: int = 1) -> dict[str, Any]:
+        '''the response to a candidate, {"errors": [...]} or {"error": "..."} if it could not be checked'''
+        return await (await self.submit(candidate, initial, max_steps))
+
+    async def _dispatch(self, slot: int):
+        while True:
+            job = await self._queue.get()
+            start = time.perf_counter()
+            self.wait_seconds += start - job.queued_at
+            self.running += 1
+            try:
+                kind, value = await self._pool[slot].check(job.candidate, job.initial, job.max_steps, self.deadline)
+                response = {kind: value}
+                if kind == 'error':
+                    self.failed += 1
+            except TimeoutError:
+                self.timed_out += 1
+                response = {'error': 'deadline exceeded'}
+                await self._restart(slot)
+            except (EOFError, OSError):
+                self.failed += 1
+                response = {'error': 'worker failed'}
+                await self._restart(slot)
+            finally:
+                self.running -= 1
+                self.busy_seconds += time.perf_counter() - start
+            self.completed += 1
+            if not job.result.done():
+                job.result.set_result(response)
+
+    async def _restart(self, slot: int):
+        self._pool[slot].kill()
+        self._pool[slot] = await asyncio.get_running_loop().run_in_executor(None, _Worker, self._context,
+                                                                            self.time_limit)
+        self.restarts += 1
+
+    async def handle(self, line: str, respond: Callable[[dict[str, Any]], None]) -> asyncio.Future | None:
+        '''answers the request on line with respond once it is checked
+
+        returns once the request is queued, with the future of its response, None if it was answered right away
+        '''
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            request, error = {}, e
+        else:
+            error = None if isinstance(request, dict) else ValueError('not an object')
+            request = request if isinstance(request, dict) else {}
+        id_ = request.get('id')
+        if request.get('metrics'):
+            respond({'id': id_, 'metrics': self.metrics._asdict()})
+            return None
+        candidate, initial, max_steps = request.get('candidate'), request.get('initial'), request.get('max_steps', 1)
+        if error is None and not (isinstance(candidate, str) and isinstance(initial, str)):
+            error = ValueError('candidate and initial must be strings')
+        if error is None and not (isinstance(max_steps, int) and max_steps >= 1):
+            error = ValueError('max_steps must be a positive integer')
+        if error is not None:
+            self.invalid += 1
+            respond({'id': id_, 'error': f'invalid request: {error}'})
+            return None
+        result = await self.submit(candidate, initial, max_steps)
+        result.add_done_callback(lambda result: respond({'id': id_, **result.result()}))
+        return result
+
+
+async def _serve_lines(service: GradingService, lines: Callable[[], Awaitable[str]],
+                       write: Callable[[str], None]):
+    '''handles the requests read with lines until it returns an empty string, then waits for their responses'''
+    pending: list[asyncio.Future] = []
+
+    def respond(response: dict[str, Any]):
+        write(json.dumps(response, ensure_ascii=False) + '\n')
+
+    while line := await lines():
+        if line.strip() and (result := await service.handle(line, respond)) is not None:
+            pending.append(result)
+            pending = [result for result in pending if not result.done()]
+    await asyncio.gather(*pending)
+
+
+async def serve_stdio(service: GradingService):
+    def write(line: str):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+    await _serve_lines(service, lambda: asyncio.to_thread(sys.stdin.readline), write)
+
+
+async def serve_socket(service: GradingService, path: str | None = None, port: int | None = None):
+    async def connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def lines() -> str:
+            return (await reader.readline()).decode()
+        await _serve_lines(service, lines, lambda line: writer.write(line.encode()))
+        await writer.drain()
+        writer.close()
+
+    server = await (asyncio.start_unix_server(connection, path) if path is not None
+                    else asyncio.start_server(connection, '127.0.0.1', port))
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='checks candidates sent as JSON lines, see lambda_calc.service')
+    parser.add_argument('--workers', type=int, help='worker processes, the number of processors by default')
+    parser.add_argument('--deadline', type=float, default=5.0, help='seconds a candidate may take')
+    parser.add_argument('--queue-size', type=int, default=64, help='candidates waiting for a worker at most')
+    parser.add_argument('--time-limit', type=float, help='seconds after which a worker stops a candidate itself')
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument('--socket', help='path of a unix socket to listen on instead of stdin')
+    listen.add_argument('--port', type=int, help='port of localhost to listen on instead of stdin')
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with GradingService(args.workers, args.deadline, args.queue_size, args.time_limit) as service:
+            if args.socket is None and args.port is None:
+                await serve_stdio(service)
+            else:
+                await serve_socket(service, args.socket, args.port)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+from array import array
+from .ast import App, DBApp, DBFree, DBLam, DBTerm, DBVar, Fun, LambdaExpr, Var, from_debruijn
+
+__all__ = ['TermStore', 'VAR', 'FREE', 'LAM', 'APP']
+
+# tags of the nodes of a store
+VAR = 0   # a bound variable, left is its de Bruijn index
+FREE = 1  # a free variable, name is the id of its name
+LAM = 2   # a function, left is its body, name is the id of its argument's name,
+#           right is 1 if it is another argument of the function above it, like y in λxy.x
+APP = 3   # an application of left to right
+
+
+class _Builder:
+    '''appends nodes to the arrays of a new store, children before their parents
+
+    variables are shared, so every index and free name is stored once
+    '''
+
+    def __init__(self, names: list[str] | None = None):
+        self.tag = array('b')
+        self.left = array('i')
+        self.right = array('i')
+        self.name = array('i')
+        self.names: list[str] = names if names is not None else []
+        self.name_ids = {name: i for i, name in enumerate(self.names)}
+        self.leaves: dict[tuple[int, int], int] = {}
+
+    def add(self, tag: int, left: int, right: int, name: int) -> int:
+        self.tag.append(tag)
+        self.left.append(left)
+        self.right.append(right)
+        self.name.append(name)
+        return len(self.tag) - 1
+
+    def name_id(self, name: str) -> int:
+        id_ = self.name_ids.get(name)
+        if id_ is None:
+            id_ = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return id_
+
+    def var(self, index: int) -> int:
+        node = self.leaves.get((VAR, index))
+        if node is None:
+            node = self.leaves[VAR, index] = self.add(VAR, index, 0, -1)
+        return node
+
+    def free(self, name: int) -> int:
+        node = self.leaves.get((FREE, name))
+        if node is None:
+            node = self.leaves[FREE, name] = self.add(FREE, 0, 0, name)
+        return node
+
+    def store(self, root: int) -> 'TermStore':
+        return TermStore(self.tag, self.left, self.right, self.name, self.names, root)
+
+
+class TermStore:
+    '''a term as parallel arrays of tags, children and name ids, with nameless (de Bruijn) bound variables
+
+    a node is an index into the arrays and its children always come before it, so properties computed
+    from the children are one loop over the arrays. subterms can be shared between several parents,
+    sizes and counts are those of the term written out as a tree.
+    '''
+    __slots__ = ('tag', 'left', 'right', 'name', 'names', 'root', '_reach')
+
+    def __init__(self, tag: array, left: array, right: array, name: array, names: list[str], root: int):
+        self.tag = tag
+        self.left = left
+        self.right = right
+        self.name = name
+        self.names = names
+        self.root = root
+        self._reach: array | None = None
+
+    def __len__(self) -> int:
+        '''the number of stored nodes'''
+        return len(self.tag)
+
+    def __repr__(self) -> str:
+        return f'<TermStore of {len(self)} nodes>'
+
+    @property
+    def nbytes(self) -> int:
+        '''the memory taken by the arrays'''
+        return sum(a.itemsize * len(a) for a in (self.tag, self.left, self.right, self.name))
+
+    @classmethod
+    def from_expr(cls, expr: LambdaExpr) -> 'TermStore':
+        builder = _Builder()
+        # name -> depths of the binders currently in scope for it
+        scope: dict[str, list[int]] = {}
+        depth = 0
+        results: list[int] = []
+        stack: list[LambdaExpr | tuple] = [expr]
+        while stack:
+            node = stack.pop()
+            match node:
+                case Var(name):
+                    levels = scope.get(name)
+                    results.append(builder.var(depth - levels[-1] - 1) if levels else builder.free(builder.name_id(name)))
+                case Fun(args, body):
+                    for arg in args:
+                        scope.setdefault(arg.name, []).append(depth)
+                        depth += 1
+                    stack.append(('fun', node))
+                    stack.append(body)
+                case App(fun, arg):
+                    stack.append(('app',))
+                    stack.append(arg)
+                    stack.append(fun)
+                case ('app',):
+                    arg_ = results.pop()
+                    results.append(builder.add(APP, results.pop(), arg_, -1))
+                case ('fun', Fun(args)):
+                    term = results.pop()
+                    for i in reversed(range(len(args))):
+                        scope[args[i].name].pop()
+                        term = builder.add(LAM, term, i > 0, builder.name_id(args[i].name))
+                    depth -= len(args)
+                    results.append(term)
+        return builder.store(results[0])
+
+    def to_debruijn(self) -> DBTerm:
+        '''the interned de Bruijn term, shared subterms are converted once'''
+        terms: dict[int, DBTerm] = {}
+        tag, left, right = self.tag, self.left, self.right
+        for node in self._reachable():
+            match tag[node]:
+                case 0:
+                    terms[node] = DBVar(left[node])
+                case 1:
+                    terms[node] = DBFree(self.names[self.name[node]])
+                case 2:
+                    terms[node] = DBLam(terms[left[node]])
+                case 3:
+                    terms[node] = DBApp(terms[left[node]], terms[right[node]])
+        return terms[self.root]
+
+    def to_expr(self) -> LambdaExpr:
+        '''converts the store back into an expression, keeping the names of the binders
+
+        if a variable would be captured by a binder of the same name, as reductions can cause,
+        all binders get fresh names instead like in from_debruijn
+        '''
+        tag, left, right, name, names = self.tag, self.left, self.right, self.name, self.names
+        # names of the binders around the current node, innermost last, and their depths by name
+        binders: list[str] = []
+        scope: dict[str, list[int]] = {}
+        results: list[LambdaExpr] = []
+        stack: list[int | tuple] = [self.root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, tuple):
+                if node[0] == 'app':
+                    arg_ = results.pop()
+                    results.append(App(results.pop(), arg_))
+                else:
+                    args = node[1]
+                    for arg in args:
+                        binders.pop()
+                        scope[arg].pop()
+                    results.append(Fun([Var(arg) for arg in args], results.pop()))
+                continue
+            match tag[node]:
+                case 0:
+                    var = binders[len(binders) - 1 - left[node]]
+                    if scope[var][-1] != len(binders) - 1 - left[node]:
+                        return from_debruijn(self.to_debruijn())
+                    results.append(Var(var))
+                case 1:
+                    var = names[name[node]]
+                    if scope.get(var):
+                        return from_debruijn(self.to_debruijn())
+                    results.append(Var(var))
+                case 2:
+                    # the arguments of one function are a chain of marked lambdas
+                    args = [names[name[node]]]
+                    body = left[node]
+                    while tag[body] == LAM and right[body]:
+                        args.append(names[name[body]])
+                        body = left[body]
+                    for arg in args:
+                        scope.setdefault(arg, []).append(len(binders))
+                        binders.append(arg)
+                    stack.append(('fun', args))
+                    stack.append(body)
+                case 3:
+                    stack.append(('app',))
+                    stack.append(right[node])
+                    stack.append(left[node])
+        return results[0]
+
+    def _reachable(self) -> list[int]:
+        '''the nodes reachable from the root, children first'''
+        tag, left, right = self.tag, self.left, self.right
+        seen = bytearray(len(tag))
+        seen[self.root] = 1
+        for node in range(self.root, -1, -1):
+            if seen[node]:
+                if tag[node] >= LAM:
+                    seen[left[node]] = 1
+                if tag[node] == APP:
+                    seen[right[node]] = 1
+        return [node for node in range(self.root + 1) if seen[node]]
+
+    def _count(self, own) -> list[int]:
+        '''own(node) added up over every node of the tree below each node'''
+        tag, left, right = self.tag, self.left, self.right
+        counts = [0] * len(tag)
+        for node in range(len(tag)):
+            count = own(node)
+            if tag[node] >= LAM:
+                count += counts[left[node]]
+            if tag[node] == APP:
+                count += counts[right[node]]
+            counts[node] = count
+        return counts
+
+    def size(self) -> int:
+        '''the number of variables, functions of one argument and applications'''
+        return self._count(lambda node: 1)[self.root]
+
+    def depth(self) -> int:
+        '''the number of nodes on the longest path from the root'''
+        tag, left, right = self.tag, self.left, self.right
+        depths = array('i', bytes(4 * len(tag)))
+        for node in range(len(tag)):
+            if tag[node] == APP:
+                depths[node] = 1 + max(depths[left[node]], depths[right[node]])
+            elif tag[node] == LAM:
+                depths[node] = 1 + depths[left[node]]
+            else:
+                depths[node] = 1
+        return depths[self.root]
+
+    def _redexes(self) -> list[int]:
+        tag, left = self.tag, self.left
+        return self._count(lambda node: int(tag[node] == APP and tag[left[node]] == LAM))
+
+    def count_redexes(self) -> int:
+        '''the number of redexes, including ones inside the function of another redex'''
+        return self._redexes()[self.root]
+
+    def count_free(self) -> int:
+        '''the number of occurrences of free variables'''
+        tag = self.tag
+        return self._count(lambda node: int(tag[node] == FREE))[self.root]
+
+    def free_names(self) -> frozenset[str]:
+        tag, name, names = self.tag, self.name, self.names
+        return frozenset(names[name[node]] for node in self._reachable() if tag[node] == FREE)
+
+    def _reaches(self) -> array:
+        '''for every node, the highest index of a variable in it minus the functions between them, -1 if none
+
+        a node does not refer to the binders more than that many levels above it
+        '''
+        if self._reach is None:
+            tag, left, right = self.tag, self.left, self.right
+            reach = array('i', [-1]) * len(tag)
+            for node in range(len(tag)):
+                match tag[node]:
+                    case 0:
+                        reach[node] = left[node]
+                    case 2:
+                        reach[node] = max(reach[left[node]] - 1, -1)
+                    case 3:
+                        reach[node] = max(reach[left[node]], reach[right[node]])
+            self._reach = reach
+        return self._reach
+
+    def beta(self, redex: int = 0) -> 'TermStore':
+        '''reduces the redex-th redex in leftmost outermost order, into a new store of only the nodes it uses'''
+        tag, left, right = self.tag, self.left, self.right
+        counts = self._redexes()
+        if not 0 <= redex < counts[self.root]:
+            raise IndexError(f'there are {counts[self.root]} redexes')
+        # the nodes above the redex and which child leads to it
+        path: list[tuple[int, int]] = []
+        node = self.root
+        while True:
+            if tag[node] == APP and tag[left[node]] == LAM:
+                if redex == 0:
+                    break
+                redex -= 1
+            if tag[node] == APP and redex >= counts[left[node]]:
+                redex -= counts[left[node]]
+                path.append((node, 1))
+                node = right[node]
+            else:
+                path.append((node, 0))
+                node = left[node]
+
+        builder = _Builder(list(self.names))
+        copy = _Copier(self, builder)
+        lam = left[node]
+        result = copy.substitute(left[lam], right[node])
+        if builder.tag[result] == LAM and builder.right[result]:
+            # what was the next argument starts a function of its own
+            result = builder.add(LAM, builder.left[result], 0, builder.name[result])
+        for parent, side in reversed(path):
+            if tag[parent] == LAM:
+                result = builder.add(LAM, result, right[parent], self.name[parent])
+            elif side == 0:
+                result = builder.add(APP, result, copy.copy(right[parent]), -1)
+            else:
+                result = builder.add(APP, copy.copy(left[parent]), result, -1)
+        return builder.store(result)
+
+
+# the mode of _Copier._map that leaves nodes unchanged
+_COPY = ('shift', 0)
+
+
+class _Copier:
+    '''copies nodes of a store into a builder, substituting and shifting de Bruijn indices on the way'''
+
+    def __init__(self, store: TermStore, builder: _Builder):
+        self.store = store
+        self.builder = builder
+        self.reach = store._reaches()
+        # results by node, depth and mode, so shared nodes are copied once for each depth they occur at
+        self.memo: dict[tuple[int, int, tuple[str, int]], int] = {}
+
+    def copy(self, node: int) -> int:
+        return self._map(node, 0, _COPY)
+
+    def substitute(self, body: int, arg: int) -> int:
+        '''copies the body of a function with its variable replaced by arg, removing the function'''
+        return self._map(body, 0, ('arg', arg))
+
+    def _map(self, start: int, depth: int, mode: tuple[str, int]) -> int:
+        '''copies start, depth functions below the one being reduced
+
+        in mode ('arg', arg) variables bound by that function are replaced by arg and the ones bound above it
+        are decremented, in mode ('shift', amount) the ones bound above depth are incremented by amount
+        '''
+        builder, reach, memo = self.builder, self.reach, self.memo
+        tag, left, right, name = self.store.tag, self.store.left, self.store.right, self.store.name
+        results: list[int] = []
+        stack: list[tuple[int, int, tuple[str, int], bool]] = [(start, depth, mode, False)]
+        while stack:
+            node, depth, mode, visited = stack.pop()
+            if visited:
+                if tag[node] == LAM:
+                    result = builder.add(LAM, results.pop(), right[node], name[node])
+                else:
+                    arg_ = results.pop()
+                    result = builder.add(APP, results.pop(), arg_, -1)
+                memo[node, depth, mode] = result
+                results.append(result)
+                continue
+            if mode is not _COPY and reach[node] < depth:
+                # no variable in node is bound at or above depth, so nothing in it changes
+                depth, mode = 0, _COPY
+            result = memo.get((node, depth, mode))
+            if result is not None:
+                results.append(result)
+                continue
+            match tag[node]:
+                case 0:
+                    index = left[node]
+                    if mode[0] == 'shift':
+                        result = builder.var(index + mode[1] if index >= depth else index)
+                    elif index < depth:
+                        result = builder.var(index)
+                    elif index > depth:
+                        result = builder.var(index - 1)
+                    else:
+                        # arg moves under depth more functions
+                        result = self._map(mode[1], 0, ('shift', depth) if depth else _COPY)
+                    memo[node, depth, mode] = result
+                    results.append(result)
+                case 1:
+                    results.append(builder.free(name[node]))
+                case 2:
+                    stack.append((node, depth, mode, True))
+                    stack.append((left[node], 0 if mode is _COPY else depth + 1, mode, False))
+                case 3:
+                    stack.append((node, depth, mode, True))
+                    stack.append((right[node], depth, mode, False))
+                    stack.append((left[node], depth, mode, False))
+        return results[0]
@@ -1,19 +1,199 @@
-from .core import alpha_equiv, all_beta_reductions, is_simple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from itertools import islice
+from .ast import App, Fun, LambdaExpr
+from .cache import ReductionCache
+from .core import (ReductionIndex, ReductionType, alpha_equiv, diff_path, find_reduction, is_simple,
+                   reduce_at, reduction_index)
+from .graph import reduction_path
+from .limits import Governor, ResourceLimitExceeded
 from .parser import parse
-from typing import List
+from . import instrument, limits
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, List, NamedTuple
 
+__all__ = ['check_candidate_str', 'check_candidates', 'CandidateChecker']
 
-def check_candidate_str(candidate_string: str, initial_expr: str) -> List[str]:
-    '''Takes in the candidate string and returns a list of all possible errors'''
-    lines = candidate_string.split('\n')
 
+class _Initial(NamedTuple):
+    '''the parsed initial expression and its one step reductions, shared by every submission'''
+    expr: LambdaExpr
+    index: ReductionIndex
+    # the steps, nodes and seconds preparing them took, charged to every submission sharing them
+    cost: tuple[int, int, float] = (0, 0, 0.0)
+
+
+def check_candidate_str(
+        candidate_string: str,
+        initial_expr: str,
+        cache: ReductionCache | None = None,
+        max_steps: int = 1,
+        governor: Governor | None = None,
+        notes: list[str] | None = None) -> List[str]:
+    '''Takes in the candidate string and returns a list of all possible errors
+
+    reductions are looked up in cache if one is given, so they can be shared between submissions.
+    with max_steps above 1, a beta line may do up to max_steps beta reductions at once. such a line is accepted,
+    the terms it skipped are appended to notes if it is given.
+    the whole candidate is checked within the limits of governor if one is given, otherwise of the governor around
+    the call, the line going over them gets a resource limit error that ends the check
+    '''
+    return _check(candidate_string, lambda: _prepare(initial_expr, cache), cache, max_steps, governor, notes)
+
+
+def _prepare(initial_expr: str, cache: ReductionCache | None = None) -> _Initial:
+    expr = parse(initial_expr)
+    return _Initial(expr, cache.index(expr) if cache else reduction_index(expr))
+
+
+def _prepare_shared(initial_expr: str, cache: ReductionCache | None = None) -> _Initial:
+    '''_prepare for many submissions, measuring what it costs'''
+    start = perf_counter()
+    with Governor() as meter:
+        initial = _prepare(initial_expr, cache)
+    return initial._replace(cost=(meter.steps, meter.nodes, perf_counter() - start))
+
+
+def _shared(initial: _Initial) -> Callable[[], _Initial]:
+    '''gives initial to a submission, charging the governor checking it for preparing it like check_candidate_str'''
+    def get() -> _Initial:
+        governor = limits.current()
+        if governor is not None:
+            governor.charge(*initial.cost)
+        return initial
+    return get
+
+
+def _likely_reduction(
+        prev_expr: LambdaExpr,
+        current_expr: LambdaExpr,
+        reduction_type: ReductionType) -> tuple[ReductionType, LambdaExpr] | None:
+    '''tries the redexes above the subterm where current_expr differs from prev_expr, outermost first'''
+    path = diff_path(prev_expr, current_expr)
+    if path is None:
+        return None
+    node = prev_expr
+    for depth in range(len(path) + 1):
+        if isinstance(node, App) and isinstance(node.fun, Fun):
+            reduction = reduce_at(prev_expr, path[:depth])
+            if reduction[0] == reduction_type and alpha_equiv(reduction[1], current_expr):
+                return reduction
+            if depth < len(path) and path[depth] == 'fun':
+                # redexes in the function of a redex are not reductions of their own
+                return None
+        if depth < len(path):
+            node = getattr(node, path[depth])
+    return None
+
+
+class _State(NamedTuple):
+    '''what checking the lines up to one of them leaves for the next one'''
+    prev_expr: 'LambdaExpr | None' = None
+    current_expr: 'LambdaExpr | None' = None
+    index: ReductionIndex | None = None
+    # an error ended the check, no later line and no final check is done
+    stopped: bool = False
+    # the error was running over a resource limit, so checking the line again may succeed
+    limited: bool = False
+    # the beta reductions the line skipped, if it did more than one
+    note: str | None = None
+
+
+def _check_line(state: _State, line_num: int, line: str, initial, cache: ReductionCache | None,
+                max_steps: int = 1) -> tuple[_State, str | None]:
+    '''checks a stripped, non empty line after the lines that left state, returning the new state and its error'''
+    if instrument.active is not None:
+        instrument.active.counts['lines'] += 1
+    try:
+        return _verify_line(state, line_num, line, initial, cache, max_steps)
+    except ResourceLimitExceeded:
+        return state._replace(stopped=True, limited=True), f'Line {line_num}: Resource limit exceeded'
+
+
+def _verify_line(state: _State, line_num: int, line: str, initial, cache: ReductionCache | None,
+                 max_steps: int) -> tuple[_State, str | None]:
+    prev_expr, current_expr, index, *_ = state
+
+    # Parse the first lambda expression
+    if not prev_expr:
+        try:
+            prev_expr = parse(line)
+        except:
+            return state._replace(stopped=True), "Line 0: Cannot parse initial lambda expression"
+
+        initial_ = initial()
+        if prev_expr != initial_.expr:
+            return state._replace(stopped=True), "Line 0: Initial expression does not match"
+        return _State(prev_expr, None, initial_.index), None
+
+    if line.startswith('a->'):
+        reduction_type = 'alpha'
+    elif line.startswith('b->'):
+        reduction_type = 'beta'
+    else:
+        return state._replace(stopped=True), f'Line {line_num}: Invalid reduction type'
+
+    try:
+        current_expr = parse(line[3:])
+    except:
+        return state._replace(stopped=True), f'Line {line_num}: Could not parse lambda expression'
+
+    if reduction_type == 'alpha' and not alpha_equiv(prev_expr, current_expr):
+        return _State(prev_expr, current_expr, index, True), f'Line {line_num}: Alpha reduction is not valid'
+
+    reduction = None
+    if index is None and not cache:
+        # reducing the redex the line changed is cheaper than building every reduction
+        reduction = _likely_reduction(prev_expr, current_expr, reduction_type)
+    if reduction is None:
+        if index is None:
+            index = cache.index(prev_expr) if cache else reduction_index(prev_expr)
+        reduction = find_reduction(index, current_expr, reduction_type)
+    if reduction:
+        return _State(reduction[1], current_expr, None), None
+    if reduction_type == 'beta' and max_steps > 1:
+        path = reduction_path(prev_expr, current_expr, max_steps)
+        # a path of one step renames before reducing, a line skipping only the alpha step is not accepted
+        if path and len(path) > 1:
+            skipped = ''.join(f', through {step}' if i == 0 else f', {step}' for i, step in enumerate(path[:-1]))
+            note = f'Line {line_num}: {len(path)} beta reductions in one line{skipped}'
+            return _State(path[-1], current_expr, None, note=note), None
+    if reduction_type == 'alpha':
+        return _State(prev_expr, current_expr, index), f'Line {line_num}: Alpha reduction not necessary'
+    return _State(prev_expr, current_expr, index, True), f'Line {line_num}: Invalid beta reduction'
+
+
+def _final(state: _State, cache: ReductionCache | None) -> str | None:
+    '''the error of a candidate whose lines left state, once all of them are checked'''
+    if state.stopped:
+        return None
+    if not state.current_expr:
+        return 'No reduction found'
+    try:
+        simple = cache.is_simple(state.current_expr) if cache else is_simple(state.current_expr)
+    except ResourceLimitExceeded:
+        return 'Resource limit exceeded checking the last expression'
+    if not simple:
+        return 'Last expression is not a simple expression'
+    return None
+
+
+@instrument.timed('check')
+def _check(candidate_string: str, initial, cache: ReductionCache | None = None, max_steps: int = 1,
+           governor: Governor | None = None, notes: list[str] | None = None) -> List[str]:
+    '''checks a candidate string, initial returns the _Initial of the initial expression when it is first needed'''
+    with governor if governor is not None else nullcontext():
+        return _check_lines(candidate_string.split('\n'), initial, cache, max_steps, notes)
+
+
+def _check_lines(lines: list[str], initial, cache: ReductionCache | None, max_steps: int,
+                 notes: list[str] | None) -> List[str]:
     error_lines: list[str] = []
     if not lines:
         error_lines.append("There are no lines")
         return error_lines
 
-    prev_expr = None
-    current_expr = None
+    state = _State()
     # Iterate through the line numbers
     for line_num in range(1, len(lines)):
         line = lines[line_num].strip()
@@ -21,52 +201,181 @@ def check_candidate_str(candidate_string: str, initial_expr: str) -> List[str]:
         if not line:
             continue
 
-        # Parse the first lambda expression
-        if not prev_expr:
-            try:
-                prev_expr = parse(line)
-            except:
-                error_lines.append("Line 0: Cannot parse initial lambda expression")
-                return error_lines
+        state, error = _check_line(state, line_num, line, initial, cache, max_steps)
+        if error:
+            error_lines.append(error)
+        if state.stopped:
+            return error_lines
+        if state.note is not None and notes is not None:
+            notes.append(state.note)
 
-            if prev_expr != parse(initial_expr):
-                error_lines.append("Line 0: Initial expression does not match")
-                return error_lines
+    error = _final(state, cache)
+    if error:
+        error_lines.append(error)
+    return error_lines
 
-            continue
 
-        if line.startswith('a->'):
-            reduction_type = 'alpha'
-        elif line.startswith('b->'):
-            reduction_type = 'beta'
-        else:
-            error_lines.append(f'Line {line_num}: Invalid reduction type')
-            break
+class CandidateChecker:
+    '''checks a candidate as it is typed, keeping the state left by every checked line
 
-        try:
-            current_expr = parse(line[3:])
-        except:
-            error_lines.append(f'Line {line_num}: Could not parse lambda expression')
-            break
+    lines are numbered like the lines of a candidate string in check_candidate_str, line 0 is ignored.
+    after an edit only the lines from the first edited one are checked again, so editing the end of a derivation
+    costs the same however long it is. set_line, append and replace take constant time besides the lines they add,
+    update compares the new candidate string with the current lines to find the first edit.
+    '''
+
+    def __init__(self, initial_expr: str, cache: ReductionCache | None = None, max_steps: int = 1,
+                 governor: Governor | None = None):
+        self.initial_expr = initial_expr
+        self.cache = cache
+        self.max_steps = max_steps
+        self.governor = governor
+        self.lines: list[str] = ['']
+        self._initial: _Initial | None = None
+        # the state after every checked line, and the number of errors up to it
+        self._states: list[_State] = [_State()]
+        self._counts: list[int] = [0]
+        self._errors: list[str] = []
 
-        if reduction_type == 'alpha' and not alpha_equiv(prev_expr, current_expr):
-            error_lines.append(f'Line {line_num}: Alpha reduction is not valid')
-            break
+    def _prepare(self) -> _Initial:
+        if self._initial is None:
+            self._initial = _prepare(self.initial_expr, self.cache)
+        return self._initial
 
-        for reduced_reduction_type, reduced_expr in all_beta_reductions(prev_expr):
-            if reduced_reduction_type == reduction_type and alpha_equiv(reduced_expr, current_expr):
-                prev_expr = reduced_expr
-                break
+    def _edited(self, line_num: int):
+        keep = max(line_num, 1)
+        del self._states[keep:]
+        del self._counts[keep:]
+        del self._errors[self._counts[-1]:]
+
+    def set_line(self, line_num: int, line: str):
+        '''replaces line line_num, or adds it after the last line'''
+        if line_num == len(self.lines):
+            self.lines.append(line)
         else:
-            if reduction_type == 'alpha':
-                error_lines.append(f'Line {line_num}: Alpha reduction not necessary')
-            else:
-                error_lines.append(f'Line {line_num}: Invalid beta reduction')
-                break
-    else:
-        if not current_expr:
-            error_lines.append('No reduction found')
-        elif not is_simple(current_expr):
-            error_lines.append('Last expression is not a simple expression')
+            self.lines[line_num] = line
+        self._edited(line_num)
 
-    return error_lines
+    def append(self, line: str):
+        self.set_line(len(self.lines), line)
+
+    def replace(self, start: int, stop: int, lines: Iterable[str]):
+        '''replaces lines start to stop, not including stop, with lines'''
+        self.lines[start:stop] = lines
+        self._edited(start)
+
+    def update(self, candidate_string: str):
+        '''replaces the candidate with candidate_string'''
+        lines = candidate_string.split('\n')
+        first = next((i for i, (old, new) in enumerate(zip(self.lines, lines)) if old != new),
+                     min(len(self.lines), len(lines)))
+        self.replace(first, len(self.lines), lines[first:])
+
+    def notes(self) -> list[str]:
+        '''the notes check_candidate_str gives for the lines checked so far'''
+        # empty lines keep the state of the line before
+        return [state.note for before, state in zip(self._states, self._states[1:])
+                if state is not before and state.note is not None and not state.stopped]
+
+    def errors(self) -> Iterator[str]:
+        '''yields the errors check_candidate_str returns for the candidate, checking lines as they are reached
+
+        the candidate must not be edited while the errors are being read. the lines checked by one call
+        share the limits of the governor, which start over on the next call.
+        '''
+        yield from self._errors
+        if self.governor is not None:
+            self.governor.reset()
+        state = self._states[-1]
+        while not state.stopped and len(self._states) < len(self.lines):
+            line_num = len(self._states)
+            line = self.lines[line_num].strip()
+            error = None
+            if line:
+                with self._resumed():
+                    state, error = _check_line(state, line_num, line, self._prepare, self.cache, self.max_steps)
+            if state.limited:
+                # not kept, the line is checked again next time
+                yield error
+                return
+            if error:
+                self._errors.append(error)
+            self._states.append(state)
+            self._counts.append(len(self._errors))
+            if error:
+                yield error
+        with self._resumed():
+            error = _final(state, self.cache)
+        if error:
+            yield error
+
+    def _resumed(self):
+        # the governor is only current while checking, not while the caller reads the errors
+        return self.governor.resumed() if self.governor is not None else nullcontext()
+
+
+# the initial expression of the submissions graded by this worker process
+_worker_initial: _Initial | None = None
+_worker_cache: ReductionCache | None = None
+
+
+def _init_worker(initial_expr: str, cache: ReductionCache | None):
+    global _worker_initial, _worker_cache
+    _worker_cache = cache
+    _worker_initial = _prepare_shared(initial_expr, cache)
+
+
+def _check_each(submissions: Iterable[str], initial: _Initial, cache: ReductionCache | None, max_steps: int,
+                governor: Governor | None) -> Iterator[List[str]]:
+    '''checks the submissions one after the other, each within the limits of governor from the start'''
+    for candidate in submissions:
+        if governor is not None:
+            governor.reset()
+        yield _check(candidate, _shared(initial), cache, max_steps, governor)
+
+
+def _check_chunk(start: int, chunk: list[str], max_steps: int = 1,
+                 governor: Governor | None = None) -> list[tuple[int, List[str]]]:
+    return list(enumerate(_check_each(chunk, _worker_initial, _worker_cache, max_steps, governor), start))
+
+
+def _chunks(submissions: Iterable[str], size: int) -> Iterator[tuple[int, list[str]]]:
+    submissions = iter(submissions)
+    start = 0
+    while chunk := list(islice(submissions, size)):
+        yield start, chunk
+        start += len(chunk)
+
+
+def check_candidates(
+        submissions: Iterable[str],
+        initial_expr: str,
+        workers: int | None = None,
+        ordered: bool = True,
+        chunksize: int = 16,
+        cache: ReductionCache | None = None,
+        max_steps: int = 1,
+        governor: Governor | None = None) -> Iterator[tuple[int, List[str]]]:
+    '''checks many candidate strings against the same initial expression on a pool of worker processes
+
+    yields the position of every submission with its errors, in input order if ordered, otherwise as they finish.
+    each worker parses the initial expression and finds its reductions once, so submissions only pay for their
+    own lines. workers defaults to the number of processors, with workers=1 everything runs in this process.
+    with a cache, reductions are shared between submissions: workers=1 uses it directly, otherwise every worker
+    starts from a copy of it. max_steps applies to every submission like in check_candidate_str, and so do the limits
+    of governor, by default the governor around the call: every submission starts over with them and is charged
+    for preparing the initial expression as if it did that itself.
+    '''
+    if governor is None:
+        governor = limits.current()
+    if workers == 1:
+        yield from enumerate(_check_each(submissions, _prepare_shared(initial_expr, cache), cache, max_steps,
+                                         governor))
+        return
+    # fail here rather than in every worker
+    parse(initial_expr)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(initial_expr, cache)) as executor:
+        futures = [executor.submit(_check_chunk, start, chunk, max_steps, governor)
+                   for start, chunk in _chunks(submissions, chunksize)]
+        for future in (futures if ordered else as_completed(futures)):
+            yield from future.result()
@@ -0,0 +1,16 @@
+import pytest
+
+from lambda_calc.ast import App, Fun, Var
+
+
+def _church(n: int, f: str = 'f') -> Fun:
+    body: Var | App = Var('x')
+    for _ in range(n):
+        body = App(Var(f), body)
+    return Fun([Var('f'), Var('x')], body)
+
+
+@pytest.fixture
+def church():
+    '''church(n) builds the Church numeral λfx.f(f(...x)), church(n, 'y') applies y in the body instead'''
+    return _church
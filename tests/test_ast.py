@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+import dataclasses
+import io
+import pickle
+import threading
+
+import pytest
+from inline_snapshot import snapshot
+
+from lambda_calc.ast import (App, DBApp, DBFree, DBLam, DBVar, Fun, Var, fingerprint, format_expr, free_names,
+                             fresh_names, from_debruijn, to_debruijn, write_expr)
+from lambda_calc.core import alpha_equiv
+from lambda_calc.parser import parse
+
+
+def test_to_debruijn():
+    assert to_debruijn(parse('λx.x')) is DBLam(DBVar(0))
+    assert to_debruijn(parse('λxy.xz')) is DBLam(DBLam(DBApp(DBVar(1), DBFree('z'))))
+    # currying and renaming give the same interned term
+    assert to_debruijn(parse('λab.abb')) is to_debruijn(parse('λb.λa.baa'))
+    assert to_debruijn(parse('λa.λb.abb')) is not to_debruijn(parse('λi.λj.jji'))
+    # shadowing refers to the innermost binder
+    assert to_debruijn(parse('λx.λx.x')) is DBLam(DBLam(DBVar(0)))
+    assert to_debruijn(parse('λx.yλy.x')).free == {'y'}
+
+
+def test_from_debruijn():
+    e = parse('λx.xλy.x(λz.zy)w')
+    assert str(from_debruijn(to_debruijn(e))) == snapshot('(λa.aλb.aλc.cbw)')
+    assert alpha_equiv(from_debruijn(to_debruijn(e)), e)
+    # binder names never capture free variables
+    assert str(from_debruijn(to_debruijn(parse('λx.ab')), 'abc')) == snapshot('(λc.ab)')
+    assert str(from_debruijn(to_debruijn(parse('λx.λy.yx')), ['p', 'q'])) == snapshot('(λp.λq.qp)')
+
+
+def test_fresh_names():
+    names = fresh_names(['b', "a'"])
+    assert [next(names) for _ in range(27)][-3:] == snapshot(['z', "b'", "c'"])
+
+
+def test_fingerprint():
+    assert fingerprint(parse('λxy.x(λz.zy)')) == fingerprint(parse('λa.λb.a(λc.cb)'))
+    assert fingerprint(parse('λxy.x(λz.zy)')) != fingerprint(parse('λa.λb.b(λb.ba)'))
+    assert fingerprint(parse('x')) != fingerprint(parse('y'))
+
+
+def test_free_names():
+    e = parse("λx.x y (λy.y z) (λz.z')")
+    assert free_names(e) == {'y', 'z', "z'"}
+    assert free_names(e.body.fun.arg) == {'z'}
+    assert e._free is free_names(e)
+    # cached names of shared subterms are reused
+    assert free_names(App(e, e.body)) == {'x', 'y', 'z', "z'"}
+    assert free_names(Var('q')) == {'q'}
+
+
+def test_nodes():
+    e = parse('λxy.x (λz.z y)')
+    match e:
+        case Fun(args, App(Var(name), Fun([z], body))):
+            assert args == (Var('x'), Var('y')) and name == 'x' and z == Var('z')
+    assert f'{e:terse}' == snapshot('λxy.xλz.zy') and format(e) == str(e)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        e.body = Var('x')
+    assert Fun([Var('x')], Var('x')).args == (Var('x'),)
+    # hashes are computed when nodes are built and agree with equality
+    assert hash(e) == hash(parse('λxy.x (λz.z y)')) and e._hash == hash(e)
+    assert parse("x'").name is Var(''.join(["x", "'"])).name
+    assert pickle.loads(pickle.dumps(e)) == e
+
+
+def test_write_expr():
+    e = parse('(λx.x)(y z)(λa b.a (b c) (λd.d))')
+    assert str(e) == snapshot('(((λx.x)(yz))(λab.a(bc)λd.d))')
+    assert f'{e:terse}' == snapshot('(λx.x)yzλab.a(bc)λd.d')
+    out = io.StringIO()
+    assert write_expr(e, out, terse=True) == len(f'{e:terse}') and out.getvalue() == f'{e:terse}'
+    pieces: list[str] = []
+    write_expr(e, pieces)
+    assert ''.join(pieces) == str(e) and len(pieces) > 1
+    assert format_expr(e, max_width=10) == snapshot('(((λx.x)(…')
+    assert format_expr(e, terse=True, max_width=len(f'{e:terse}')) == f'{e:terse}'
+    assert format_expr(Var('x'), max_width=1) == 'x' and format_expr(e, max_width=1) == '…'
+    with pytest.raises(ValueError):
+        format_expr(e, max_width=0)
+    # deep terms are written without recursion
+    deep = Var('x')
+    for _ in range(50_000):
+        deep = Fun([Var('y')], App(deep, Var('z')))
+    assert len(str(deep)) == 50_000 * 6 + 1 and format_expr(deep, terse=True, max_width=8) == snapshot('λy.(λy.…')
+
+
+def test_interning_threads():
+    # alpha equivalent terms converted in several threads still give the same object
+    source = 'λx.' + '(λy.y x)' * 200
+    barrier = threading.Barrier(8)
+
+    def convert(_):
+        e = parse(source)
+        barrier.wait()
+        return to_debruijn(e)
+
+    with ThreadPoolExecutor(8) as executor:
+        terms = list(executor.map(convert, range(8)))
+    assert all(term is terms[0] for term in terms)
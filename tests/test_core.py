@@ -1,8 +1,14 @@
+from functools import reduce
+
+import pytest
 from inline_snapshot import snapshot
 
-from lambda_calc.core import alpha_equiv, get_env, all_beta_reductions, is_valid_reduction, is_simple
+from lambda_calc.core import (alpha_equiv, get_env, all_beta_reductions, is_valid_reduction, is_simple,
+                              reduction_index, find_reduction, curry, normalize,
+                              StepLimitExceeded, redex_paths, subterm, reduce_at, diff_path, substitute_avoiding,
+                              contract, contract_at, reduce_redex)
 from lambda_calc.parser import parse
-from lambda_calc.ast import Var, Fun, App
+from lambda_calc.ast import Var, Fun, App, free_names
 
 
 def test_get_env():
@@ -119,3 +125,129 @@ def test_all_beta_reductions():
     assert alpha_equiv(reduced, parse("((λz'.(yz'))z)"))
     reduc_type2, reduced2 = next(all_beta_reductions(reduced))
     assert alpha_equiv(reduced2, parse('yz'))
+
+
+def test_reduction_index():
+    e = parse('(λxf.fx)(λz.z)((λq.q)(λr.r))')
+    index = reduction_index(e)
+    assert sum(map(len, index.values())) == 2
+    assert find_reduction(index, parse('(λg.g(λy.y))((λq.q)(λr.r))')) == ('beta', parse('(λf.fλz.z)((λq.q)(λr.r))'))
+    assert find_reduction(index, parse('(λxf.fx)(λz.z)(λs.s)'), 'beta')
+    assert not find_reduction(index, parse('(λxf.fx)(λz.z)(λs.s)'), 'alpha')
+    assert not find_reduction(index, e)
+    assert is_valid_reduction(e, parse('(λxf.fx)(λz.z)(λs.s)'))
+    assert not is_valid_reduction(e, parse('(λxf.xf)(λz.z)(λs.s)'))
+
+
+def test_deep_terms(church):
+    # deeper than the interpreter's recursion limit
+    n = 5000
+    e = church(n)
+    assert alpha_equiv(e, curry(church(n)))
+    assert e == church(n) and hash(e) == hash(church(n))
+    assert str(e).count('(') == n and f'{e:terse}'.startswith('λfx.f(f(')
+    assert len(get_env(e)) == n + 1
+
+    spine = reduce(App, [Var('y')] * n, e)
+    reductions = list(all_beta_reductions(spine))
+    assert [t for t, _ in reductions] == ['beta']
+    assert reductions[0][1] == reduce(App, [Var('y')] * (n - 1), Fun([Var('x')], church(n, 'y').body))
+
+
+def test_normalize(church):
+    plus = '(λmnfx.mf(nfx))'
+    result = normalize(parse(f'{plus}(λfx.f(fx))(λfx.f(f(fx)))'))
+    assert alpha_equiv(result.expr, church(5)) and result.trace is None
+
+    # normal order finds the normal form even when an argument diverges
+    e = parse('(λxy.y)((λx.xx)(λx.xx))(λz.z)')
+    assert normalize(e).steps == 2
+    with pytest.raises(StepLimitExceeded) as info:
+        normalize(e, 'applicative', max_steps=20)
+    assert info.value.result.steps == 20
+
+    # head reduction leaves redexes that are not at the head
+    result = normalize(parse('λf.(λx.f(xx))((λy.y)z)'), 'head', trace=True)
+    assert str(result.expr) == snapshot('(λf.f(((λy.y)z)((λy.y)z)))')
+    assert result.trace == [('beta', result.expr)]
+
+    # every step is a renaming or one all_beta_reductions would list, the other arguments of λxab are renamed first
+    e = parse('(λxab.abλab.x(ab)(λab.ab))(ab)')
+    for strategy in ('normal', 'applicative', 'head'):
+        prev = e
+        trace = normalize(e, strategy, trace=True).trace
+        assert trace[0][0] == 'alpha'
+        for reduction_type, reduced in trace:
+            if reduction_type == 'alpha':
+                assert alpha_equiv(prev, reduced)
+            else:
+                assert find_reduction(reduction_index(prev), reduced, 'beta')
+            prev = reduced
+
+    # applicative order reduces arguments first but does not enter the function of a redex
+    assert normalize(parse('(λx.(λy.y)x)w'), 'applicative', trace=True).trace[0] == ('beta', parse('(λy.y)w'))
+
+
+def test_shared_subterms():
+    # the reduct of F F shares the variables of F's body with the copy of F it contains
+    f = parse('λrn.nr')
+    result = normalize(App(App(f, f), Var('y')))
+    assert str(result.expr) == snapshot('(y(λrn.nr))')
+
+
+def test_substitute_shares_untouched_subterms():
+    e = parse('(λx.(λy.y)(x z)(λx.x)(λq.q x))w')
+    (_, reduced), = all_beta_reductions(e)
+    assert reduced == parse('(λy.y)(w z)(λx.x)(λq.q w)')
+    body = e.fun.body
+    # only the nodes on paths to an occurrence of x are copied
+    assert reduced.fun.fun.fun is body.fun.fun.fun
+    assert reduced.fun.arg is body.fun.arg
+    assert reduced.arg is not body.arg and reduced.arg.body.fun is body.arg.body.fun
+
+
+def test_redex_paths():
+    e = parse('(λx.x)((λy.λz.y z)(λa.z a))(λb.(λc.c)b)')
+    paths = list(redex_paths(e))
+    assert paths == snapshot([('fun',), ('fun', 'arg'), ('arg', 'body')])
+    assert str(subterm(e, paths[2])) == snapshot('((λc.c)b)')
+    assert [reduce_at(e, path) for path in paths] == list(all_beta_reductions(e))
+    assert [diff_path(e, reduced) for _, reduced in all_beta_reductions(e)] == snapshot([('fun',), ('fun', 'arg', 'fun', 'body'), ('arg', 'body')])
+    assert diff_path(e, parse(str(e))) is None
+    with pytest.raises(ValueError):
+        reduce_at(e, ('arg',))
+    with pytest.raises(ValueError):
+        subterm(e, ('body',))
+
+
+def test_substitute_avoiding():
+    e = parse('λy.x y(λx.x)(λz.y)')
+    assert substitute_avoiding(e, Var('x'), parse('y')) == snapshot(parse('λa.y a(λx.x)(λz.a)'))
+    assert substitute_avoiding(e, Var('x'), parse('y'), iter(["y'"])) == parse("λy'.y y'(λx.x)(λz.y')")
+    # no capture, so nothing is renamed and untouched subterms are shared
+    e = parse('λy.(λq.q)x')
+    assert substitute_avoiding(e, Var('x'), parse('w')) == parse('λy.(λq.q)w')
+    assert substitute_avoiding(e, Var('x'), parse('w')).body.fun is e.body.fun
+
+    # renaming and reducing in one step agrees with an alpha step followed by a beta step
+    e = parse('(λx.λa b.x a(λb y.x))(a b)')
+    assert reduce_redex(e.fun, e.arg)[0] == 'alpha'
+    reduction_type, reduced = contract(e.fun, e.arg)
+    assert reduction_type == 'alpha' and alpha_equiv(reduced, reduce_at(reduce_redex(e.fun, e.arg)[1], ())[1])
+    assert contract_at(App(Var('f'), e), ('arg',)) == (reduction_type, App(Var('f'), reduced))
+
+    # the other arguments of a function are renamed too
+    assert contract(parse('λxy.x'), Var('y')) == snapshot(('alpha', parse('λa.y')))
+
+
+def test_fresh_names_do_not_run_out():
+    # more binders to rename than the 52 names a..z and a'..z'
+    names = [f"{char}{chr(39) * primes}" for primes in range(3) for char in 'abcdefghijklmnopqrstuvwyz']
+    body = reduce(lambda body, name: Fun([Var(name)], App(body, Var(name))), names, Var('x'))
+    arg = reduce(App, [Var(name) for name in names])
+    reduction_type, renamed = reduce_redex(Fun([Var('x')], body), arg)
+    assert reduction_type == 'alpha'
+    _, reduced = reduce_at(renamed, ())
+    _, contracted = contract(Fun([Var('x')], body), arg)
+    assert alpha_equiv(reduced, contracted)
+    assert free_names(contracted) == set(names)
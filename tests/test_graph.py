@@ -0,0 +1,73 @@
+from inline_snapshot import snapshot
+import pytest
+
+from lambda_calc.ast import App, to_debruijn
+from lambda_calc.core import all_beta_reductions, alpha_equiv
+from lambda_calc.graph import Edge, explore, reduction_path
+from lambda_calc.parser import parse
+
+
+def test_explore():
+    graph = explore(parse('(λx.x)((λy.y)z)'))
+    # both redexes reduce to the same term
+    assert graph.edges == snapshot([[Edge(target=1, path=(), alpha=False), Edge(target=1, path=('arg',), alpha=False)],
+                                    [Edge(target=2, path=(), alpha=False)], []])
+    assert graph.complete and graph.has_normal_form()
+    assert graph.shortest_path() == graph.longest_path() == [0, 1, 2]
+    assert graph.find(parse('(λa.a)z')) == 1
+    for node, edges in enumerate(graph.edges):
+        reducts = [reduct for _, reduct in all_beta_reductions(graph.nodes[node])]
+        assert [edge.target for edge in edges] == [graph.find(reduct) for reduct in reducts]
+
+    # reducing the argument first saves a step
+    graph = explore(parse('(λx.x x)((λy.y)z)'))
+    assert len(graph.shortest_path()) == 3 and len(graph.longest_path()) == 4
+
+    # renamed before reducing
+    graph = explore(parse('λy.(λx.λy.x y)y'))
+    assert graph.edges[0] == [Edge(1, ('body',), True)]
+    assert alpha_equiv(graph.nodes[1], parse('λy.λa.y a'))
+
+    # the second argument of the function is renamed, not capturing y
+    graph = explore(parse('(λxy.x)y z'))
+    assert [str(graph.nodes[node]) for node in graph.normal_forms] == ['y']
+
+
+def test_cycles_and_budgets():
+    graph = explore(parse('(λx.λy.y)((λx.x x)(λx.x x))'))
+    assert len(graph) == 2 and graph.complete
+    assert graph.shortest_path() == [0, 1]
+    with pytest.raises(ValueError):
+        graph.longest_path()
+
+    growing = parse('(λx.x x x)(λx.x x x)')
+    graph = explore(growing, max_nodes=5)
+    assert len(graph) == 5 and not graph.complete
+    assert graph.has_normal_form() is None and graph.shortest_path() is None
+    graph = explore(growing, max_depth=3)
+    assert graph.depths == [0, 1, 2, 3] and graph.edges[3] is None and not graph.complete
+
+    # (λx.x x)(λx.x x) only reduces to itself
+    graph = explore(parse('(λx.x x)(λx.x x)'))
+    assert graph.complete and graph.has_normal_form() is False
+
+
+def test_explore_workers(church):
+    e = App(App(parse('λmnfx.m f(n f x)'), church(2)), church(2))
+    graph = explore(e)
+    assert graph.complete and alpha_equiv(graph.nodes[graph.shortest_path()[-1]], church(4))
+    parallel = explore(e, workers=2, chunksize=1)
+    assert [to_debruijn(node) for node in parallel.nodes] == [to_debruijn(node) for node in graph.nodes]
+    assert parallel.edges == graph.edges
+    assert len(graph.longest_path()) == len(graph.shortest_path())
+
+
+def test_reduction_path():
+    e = parse('(λx.x x)((λy.y)z)')
+    assert reduction_path(e, e, 0) == []
+    path = reduction_path(e, parse('z z'), 3)
+    # the argument is reduced first on the shortest path
+    assert path == [parse('(λx.x x)z'), parse('z z')]
+    assert reduction_path(e, parse('z z'), 1) is None
+    assert reduction_path(e, parse('z y'), 5) is None
+    assert reduction_path(parse('(λx.x x x)(λx.x x x)'), parse('z'), 100, max_nodes=50) is None
@@ -0,0 +1,39 @@
+from inline_snapshot import snapshot
+
+import lambda_calc
+from lambda_calc import instrument
+from lambda_calc.core import all_beta_reductions, alpha_equiv, get_env, reduce_redex
+from lambda_calc.parser import parse
+from lambda_calc.wrapper import check_candidate_str
+
+
+def test_stats():
+    candidate = '\n(λx.x)((λy.y)z)\nb-> (λy.y)z\nb-> z\n'
+    with lambda_calc.stats() as s:
+        assert check_candidate_str(candidate, '(λx.x)((λy.y)z)') == []
+    assert instrument.active is None
+    assert s.counts['lines'] == 3
+    assert s.counts['nodes'] > 0
+    # the initial expression is parsed again when it is first needed
+    assert len(s.samples['parse']) == 4
+    assert len(s.samples['check']) == 1
+    assert s.times['check'] >= s.times['parse']
+
+    e = parse('λy.(λx.λy.x y)y')
+    with lambda_calc.profile_stats() as s:
+        reductions = list(all_beta_reductions(e))
+        get_env(e)
+        alpha_equiv(e, e)
+        with lambda_calc.stats() as inner:
+            reduce_redex(e.body.fun, e.body.arg)
+    assert len(reductions) == 1
+    assert dict(s.counts) == snapshot({'redexes': 1, 'alpha renames': 1, 'nodes': 8, 'alpha_equiv max depth': 6})
+    # the alpha renaming builds an env for the redex too
+    assert len(s.samples['get_env']) == 2
+    # nested blocks collect separately
+    assert inner.counts['alpha renames'] == 1
+
+
+def test_disabled():
+    check_candidate_str('\n(λx.x)y\nb-> y\n', '(λx.x)y')
+    assert instrument.active is None
@@ -0,0 +1,102 @@
+import pickle
+
+import pytest
+
+from lambda_calc import Governor, ResourceLimitExceeded, limits
+from lambda_calc.core import StepLimitExceeded, alpha_equiv, normalize
+from lambda_calc.parser import parse
+from lambda_calc.wrapper import CandidateChecker, check_candidate_str, check_candidates
+
+OMEGA = '(λx.xxx)(λx.xxx)'
+
+
+def test_governor(church):
+    growing = parse(OMEGA)
+    with pytest.raises(ResourceLimitExceeded) as info:
+        with Governor(fuel=20) as governor:
+            normalize(growing, max_steps=None)
+    assert info.value.limit == 'fuel' and governor.steps == 21
+    assert limits.current() is None
+
+    with pytest.raises(ResourceLimitExceeded) as info:
+        with Governor(max_nodes=1000):
+            alpha_equiv(church(600), church(600))
+    assert info.value.limit == 'nodes'
+    with Governor(max_nodes=10_000) as governor:
+        assert alpha_equiv(church(600), church(600))
+    assert 1000 < governor.nodes < 10_000
+    # entering the current governor again does not start over
+    with governor:
+        with governor:
+            alpha_equiv(church(600), church(600))
+        assert governor.nodes > 1000 and limits.current() is governor
+    assert limits.current() is None
+
+    with pytest.raises(ResourceLimitExceeded) as info:
+        with Governor(timeout=0.05):
+            normalize(growing, max_steps=None)
+    assert info.value.limit == 'timeout'
+
+    # running out of steps is one of the resource limits
+    with pytest.raises(ResourceLimitExceeded) as info:
+        normalize(growing, max_steps=5)
+    assert isinstance(info.value, StepLimitExceeded) and info.value.limit == 'steps'
+
+
+def test_check_with_limits():
+    stuck = f'\n{OMEGA}\nb-> λz.z\n'
+    assert check_candidate_str(stuck, OMEGA, max_steps=10 ** 6, governor=Governor(timeout=0.1)) == \
+        ['Line 2: Resource limit exceeded']
+    # the governor around the call is used as well, the limits are for the whole candidate
+    initial = '(λx.x)(λz.yz)(z)'
+    candidate = f'\n{initial}\nb-> ((λz.yz)z)\nb-> (y z)\n'
+    with Governor(fuel=1):
+        assert check_candidate_str(candidate, initial) == ['Line 3: Resource limit exceeded']
+    assert check_candidate_str(candidate, initial, governor=Governor(fuel=1)) == ['Line 3: Resource limit exceeded']
+    assert check_candidate_str(candidate, initial, governor=Governor(fuel=2)) == []
+    # passing the current governor keeps its counts
+    with Governor(fuel=2) as governor:
+        normalize(parse('(λx.x)y'))
+        assert check_candidate_str(candidate, initial, governor=governor) == ['Line 3: Resource limit exceeded']
+
+    # every pass over the lines starts over
+    checker = CandidateChecker(initial, governor=Governor(fuel=1))
+    checker.update(candidate)
+    assert list(checker.errors()) == ['Line 3: Resource limit exceeded'] and list(checker.errors()) == []
+    assert limits.current() is None
+    checker = CandidateChecker(initial, governor=Governor(max_nodes=5))
+    checker.update(candidate)
+    assert list(checker.errors()) == ['Line 1: Resource limit exceeded']
+    # lines that ran over are checked again
+    checker.governor = None
+    assert list(checker.errors()) == []
+
+
+
+def test_pickle():
+    initial = '(λx.x)(λz.yz)(z)'
+    candidate = f'\n{initial}\nb-> ((λz.yz)z)\nb-> (y z)\n'
+    # only the limits are sent to other processes, also while the governor is entered
+    with Governor(fuel=100) as governor:
+        assert list(check_candidates([candidate] * 3, initial, workers=2, governor=governor)) == \
+            [(0, []), (1, []), (2, [])]
+        copy = pickle.loads(pickle.dumps(governor))
+    assert (copy.fuel, copy.max_nodes, copy.timeout, copy.steps) == (100, None, None, 0)
+
+
+def test_check_candidates_with_limits():
+    initial = '(λx.x)(λz.yz)(z)'
+    good = f'\n{initial}\nb-> ((λz.yz)z)\nb-> (y z)\n'
+    submissions = [good, f'\n{initial}\nb-> (y z)\n', good]
+    expected = [check_candidate_str(candidate, initial, governor=Governor(fuel=1)) for candidate in submissions]
+    assert expected[0] == ['Line 3: Resource limit exceeded']
+    # every submission starts over and pays for preparing the initial expression, in this process or not
+    governor = Governor(fuel=1)
+    assert [errors for _, errors in check_candidates(submissions, initial, workers=1, governor=governor)] == expected
+    assert [errors for _, errors in check_candidates(submissions, initial, workers=2, governor=governor)] == expected
+    # the governor around the call is used by default, also in the workers
+    with Governor(fuel=1) as governor:
+        for workers in (1, 2):
+            assert [errors for _, errors in check_candidates(submissions, initial, workers=workers)] == expected
+            assert [errors for _, errors in check_candidates(submissions, initial, workers=workers,
+                                                             governor=governor)] == expected
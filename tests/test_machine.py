@@ -0,0 +1,45 @@
+import pytest
+from inline_snapshot import snapshot
+
+from lambda_calc.core import StepLimitExceeded, alpha_equiv, normalize
+from lambda_calc.machine import cek, krivine, lazy
+from lambda_calc.parser import parse
+
+Y = '(λf.(λx.f(xx))(λx.f(xx)))'
+IS_ZERO = '(λn.n(λx.λxy.y)(λxy.x))'
+MULT = '(λmnf.m(nf))'
+PRED = '(λnfx.n(λgh.h(gf))(λu.x)(λu.u))'
+FACT = f'({Y}(λrn.{IS_ZERO}n(λfx.fx)({MULT}n(r({PRED}n)))))'
+
+
+def test_krivine():
+    e = parse(f'{FACT}(λfx.f(f(fx)))')
+    assert str(krivine(e)) == snapshot('(λa.λb.a(a(a(a(a(ab))))))')
+    assert alpha_equiv(krivine(e), normalize(e).expr)
+    # call by name never evaluates the unused argument
+    assert str(krivine(parse('(λxy.x)(λz.z)((λw.ww)(λw.ww))'))) == snapshot('(λa.a)')
+    # weak head normal forms stop at the first function
+    assert str(krivine(parse('λf.(λx.f(xx))((λy.y)z)'), full=False)) == snapshot('(λa.(λb.a(bb))(λb.b)z)')
+    assert str(krivine(parse('x((λa.a)b)'), full=False)) == snapshot('(x((λa.a)b))')
+    # the other arguments of λzx are renamed rather than capturing
+    e = parse('(λya.λx.y)((λzx.a)y)b')
+    assert alpha_equiv(normalize(e).expr, krivine(e)) and str(krivine(e)) == snapshot('(λb.λc.a)')
+
+
+def test_cek():
+    for s in ['(λmnfx.mf(nfx))(λfx.f(fx))(λfx.f(f(fx)))', 'λf.(λx.f(xx))((λy.y)z)', '(λx.λa.λb.x)b']:
+        assert alpha_equiv(cek(parse(s)), normalize(parse(s)).expr)
+    # arguments are values before they are passed
+    assert str(cek(parse('x((λa.a)b)'), full=False)) == snapshot('(xb)')
+    with pytest.raises(StepLimitExceeded):
+        cek(parse('(λxy.y)((λw.ww)(λw.ww))(λz.z)'), max_steps=100)
+
+
+def test_lazy():
+    for s in ['(λx.xy)(λab.ab)', 'λf.(λx.f(xx))((λy.y)z)', '(λx.λa.λb.x)b', '(λxy.x)(λz.z)((λw.ww)(λw.ww))']:
+        assert alpha_equiv(lazy(parse(s)).expr, normalize(parse(s)).expr)
+
+    # 2^10, the argument of every f is shared instead of copied
+    result = lazy(parse('(λmn.nm)(λfx.f(fx))(λfx.f(f(f(f(f(f(f(f(f(fx))))))))))'))
+    assert str(result.expr).count('a') == snapshot(1025)
+    assert (result.steps, result.allocated, result.shared) == snapshot((1035, 3098, 2047))
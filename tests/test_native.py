@@ -0,0 +1,24 @@
+import pytest
+
+from lambda_calc.native import church_to_bool, church_to_int, compile_closure
+from lambda_calc.parser import parse
+
+
+def test_call():
+    assert parse('λxy.x')(1, 2) == 1
+    assert parse('λx.xy')(lambda v: v * 2, y=21) == 42
+    assert parse("λx.xy'")(str, **{"y'": 'z'}) == 'z'
+    # alpha equivalent terms share their closure
+    f = parse('λa.λb.a')
+    assert f(1) is not None and compile_closure(f) is compile_closure(parse('λxy.x'))
+
+
+def test_church(church):
+    assert church_to_int(parse('(λmnfx.mf(nfx))(λfx.f(fx))(λfx.f(f(fx)))')) == 5
+    assert church_to_int(parse('(λmn.nm)(λfx.f(fx))(λfx.f(f(f(fx))))')) == 16
+    # deep numerals are compiled without nesting python expressions
+    assert church_to_int(church(5000)) == 5000
+    assert church_to_bool(parse('(λpq.pqp)(λxy.x)(λxy.y)')) is False
+    assert church_to_bool(compile_closure(parse('(λpq.ppq)(λxy.x)(λxy.y)'))) is True
+    with pytest.raises(ValueError):
+        church_to_int(parse('λxy.x'))
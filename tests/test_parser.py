@@ -1,7 +1,8 @@
+import parsy
 import pytest
 from inline_snapshot import snapshot
 
-from lambda_calc.parser import parse
+from lambda_calc.parser import ParseError, parse, parse_combinator
 from lambda_calc.ast import Var, Fun, App
 
 
@@ -37,3 +38,25 @@ def test_parse_fail():
         parse('λxx.x')
 
 
+def test_parse_matches_combinator():
+    """The hand written parser builds the same trees as the parsy grammar"""
+    for text in ['x', '  x  ', 'x λy.y z', "xy'z", 'L x . x', '\\x.x', 'λ x y . x', '(λx.x)((y))',
+                 'a(b)(c(d e))λq.q (r s)', 'λf.(λx.f(xx))(λx.f(xx))', 'x\n  (λy.y)\n z']:
+        assert parse(text) == parse_combinator(text)
+    # deeper than parsy can recurse
+    assert parse('(' * 5000 + 'x' + ')' * 5000) == Var('x')
+
+
+def test_parse_error_position():
+    with pytest.raises(ParseError) as info:
+        parse('λx.x\n  (y z')
+    assert (info.value.line, info.value.column) == (2, 7)
+    assert str(info.value) == snapshot("expected one of 'function', 'left paren', 'right paren', 'variable' at line 2, column 7")
+    with pytest.raises(ParseError) as info:
+        parse('λxy.x!')
+    assert (info.value.line, info.value.column) == (1, 6)
+    for text in ['', '(', ')', '()', 'λx.', 'λ.x', 'λx x', 'λx.(y', 'x)', 'λxyx.x', '.']:
+        with pytest.raises(ParseError):
+            parse(text)
+        with pytest.raises(parsy.ParseError):
+            parse_combinator(text)
@@ -3,7 +3,8 @@ from inline_snapshot import snapshot
 from lambda_calc.core import alpha_equiv, get_env, all_beta_reductions, is_valid_reduction, is_simple
 from lambda_calc.parser import parse
 from lambda_calc.ast import Var, Fun, App
-from lambda_calc.wrapper import check_candidate_str
+from lambda_calc.wrapper import CandidateChecker, check_candidate_str, check_candidates, _likely_reduction
+from lambda_calc.cache import ReductionCache
 
 
 def test_reducer_success():
@@ -65,3 +66,121 @@ def test_reducer_success():
     """
     errors = check_candidate_str(candidate_str, '(λx.x)(λz.yz)(z)')
     assert errors == snapshot(["Line 3: Alpha reduction not necessary", "Line 5: Invalid beta reduction"])
+
+
+def test_check_candidates():
+    initial = '(λx.x)(λz.yz)(z)'
+    submissions = [
+        f'\n{initial}\nb-> ((λz.yz)z)\nb-> (y z)\n',
+        f'\n{initial}\nb-> ((λz.cz)z)\nb-> (y z)\n',
+        f'\n{initial}\nb-> ((λz.yz)z)\na-> ((λx.yx)f)\n',
+        '\n(λx.x)z\nb-> z\n',
+        '\n(λx.x\n',
+    ] * 5
+    expected = [(i, check_candidate_str(submission, initial)) for i, submission in enumerate(submissions)]
+    assert expected[:5] == snapshot([(0, []), (1, ['Line 2: Invalid beta reduction']), (2, ['Line 3: Alpha reduction is not valid']), (3, ['Line 0: Initial expression does not match']), (4, ['Line 0: Cannot parse initial lambda expression'])])
+    assert list(check_candidates(submissions, initial, workers=1)) == expected
+    assert list(check_candidates(iter(submissions), initial, workers=2, chunksize=3)) == expected
+    assert sorted(check_candidates(submissions, initial, workers=2, ordered=False, chunksize=4)) == expected
+
+
+def test_reduction_cache():
+    cache = ReductionCache()
+    initial = '(λx.x)(λz.yz)(z)'
+    candidate_str = f'\n{initial}\nb-> ((λz.yz)z)\nb-> (y z)\n'
+    assert check_candidate_str(candidate_str, initial, cache) == []
+    assert cache.stats[:4] == snapshot((0, 3, 0, 2)) and cache.stats.bytes > 0
+    assert check_candidate_str(candidate_str, initial, cache) == []
+    assert cache.stats[:4] == snapshot((3, 3, 0, 2))
+    assert list(check_candidates([candidate_str] * 3, initial, workers=1, cache=cache)) == [(i, []) for i in range(3)]
+    assert cache.stats[:4] == snapshot((10, 3, 0, 2))
+
+    # alpha equivalent terms share is_simple, but reductions depend on the names of the binders
+    expr = parse('(λx.λy.xy)y')
+    assert cache.reductions(expr) == list(all_beta_reductions(expr))
+    assert cache.is_simple(parse('(λx.λa.xa)y')) is False
+    assert cache.reductions(parse('(λx.λa.xa)y')) == [('beta', parse('λa.ya'))]
+    assert cache.stats[:4] == snapshot((11, 5, 0, 3))
+
+    small = ReductionCache(maxsize=2)
+    for text in ['(λx.x)a', '(λx.x)b', '(λx.x)c']:
+        small.reductions(parse(text))
+    assert small.stats.entries == 2 and small.stats.evictions == 2  # of reductions and of is_simple
+    small.reductions(parse('(λx.x)a'))
+    assert small.stats.misses == 4
+    tiny = ReductionCache(maxbytes=1)
+    tiny.reductions(parse('(λx.x)a'))
+    tiny.reductions(parse('(λx.x)b'))
+    assert tiny.stats.entries == 1
+
+
+def test_likely_reduction():
+    # the redex a line changed is found without building every reduction
+    for text in ['(λx.x)((λy.λz.y z)(λa.z a))(λb.(λc.c)b)', '(λx.λy.xy)y', '(λf.λx.f x)(λf.λx.f x)',
+                 '(λx.x x)(λx.x x)', 'λq.(λx.λy.y x)(q q)((λz.z)q)']:
+        expr = parse(text)
+        for reduction_type, reduced in all_beta_reductions(expr):
+            found = _likely_reduction(expr, reduced, reduction_type)
+            # a reduction that changes nothing is left to the index
+            assert found == (reduction_type, reduced) or (found is None and reduced == expr)
+
+
+def test_candidate_checker():
+    initial = '(λx.x)(λz.yz)(z)'
+    checker = CandidateChecker(initial)
+    typed = ['', initial, 'b-> ((λz.yz)z)', 'a-> ((λx.yx)z)', 'b-> (y z)', '']
+    # every prefix of every line, as if it was typed
+    for line_num, line in enumerate(typed[1:], 1):
+        for end in range(len(line) + 1):
+            checker.set_line(line_num, line[:end])
+            assert list(checker.errors()) == check_candidate_str('\n'.join(checker.lines), initial)
+    assert list(checker.errors()) == snapshot(['Line 3: Alpha reduction not necessary'])
+
+    # only the edited line and the ones after it are checked again
+    checker.replace(3, 4, [])
+    assert list(checker.errors()) == []
+    checker.set_line(2, 'b-> ((λz.cz)z)')
+    assert list(checker.errors()) == snapshot(['Line 2: Invalid beta reduction'])
+    checker.set_line(2, 'b-> ((λz.yz)z)')
+    checker.append('b-> y')
+    assert list(checker.errors()) == snapshot(['Line 5: Invalid beta reduction'])
+
+    candidate = f'\n{initial}\nb-> ((λz.yz)z)\na-> ((λx.yx)f)\n'
+    checker.update(candidate)
+    assert checker.lines == candidate.split('\n')
+    assert list(checker.errors()) == check_candidate_str(candidate, initial)
+
+
+def test_skip_ahead():
+    initial = '(λx.x)(λz.yz)(z)'
+    candidate = f'\n{initial}\nb-> (y z)\n'
+    assert check_candidate_str(candidate, initial) == snapshot(['Line 2: Invalid beta reduction'])
+    notes: list[str] = []
+    assert check_candidate_str(candidate, initial, max_steps=2, notes=notes) == []
+    assert notes == snapshot(['Line 2: 2 beta reductions in one line, through ((λz.yz)z)'])
+    assert check_candidate_str(f'\n{initial}\nb-> (y q)\n', initial, max_steps=3) == snapshot(
+        ['Line 2: Invalid beta reduction'])
+    # single steps are reported as before
+    notes = []
+    assert check_candidate_str(f'\n{initial}\nb-> ((λz.yz)z)\nb-> (y z)\n', initial, max_steps=3, notes=notes) == []
+    assert notes == []
+    # skipping only the alpha step is not a skipped beta reduction
+    assert check_candidate_str('\n(λx.λy.x y)y\nb-> λz.y z\n', '(λx.λy.x y)y', max_steps=2) == snapshot(
+        ['Line 2: Invalid beta reduction'])
+    # the other argument is renamed rather than capturing y
+    initial = '(λxy.x)y z'
+    assert check_candidate_str(f'\n{initial}\nb-> y\n', initial, max_steps=2) == []
+    assert check_candidate_str(f'\n{initial}\nb-> z\n', initial, max_steps=2) == ['Line 2: Invalid beta reduction']
+
+    initial = '(λa.λb.b)((λx.x)c)((λx.x)(λx.x)d)'
+    candidate = f'\n{initial}\nb-> d\n'
+    notes = []
+    assert check_candidate_str(candidate, initial, max_steps=4, notes=notes) == []
+    assert notes[0].startswith('Line 2: 4 beta reductions in one line, through ')
+    assert list(check_candidates([candidate], initial, workers=2, max_steps=4)) == [(0, [])]
+    checker = CandidateChecker(initial, max_steps=3)
+    checker.update(candidate)
+    assert list(checker.errors()) == ['Line 2: Invalid beta reduction'] and checker.notes() == []
+    checker = CandidateChecker(initial, max_steps=4)
+    checker.update(candidate)
+    assert list(checker.errors()) == [] and checker.notes() == notes
@@ -0,0 +1,65 @@
+import mmap
+import pickle
+
+import pytest
+from inline_snapshot import snapshot
+
+from lambda_calc.ast import App, Fun, Var
+from lambda_calc.core import alpha_equiv
+from lambda_calc.parser import parse
+from lambda_calc.serial import dumps, loads, loads_from
+
+
+def test_dumps():
+    e = App(parse("λxy.x (λx.x y) z'"), Var('é'))
+    data = dumps(e)
+    assert data == snapshot(b"\x01\x04\x01x\x01y\x02z'\x02\xc3\xa9\x00\t\x00\x01\x00\x00\x06\x05\x00\x00\x02\x06\x0b\x0f")
+    assert loads(data) == e and str(loads(data)) == str(e)
+    assert loads(dumps(Var('x'))) == Var('x')
+    with pytest.raises(ValueError):
+        dumps(Fun([], Var('x')))
+    # the same variables are shared
+    loaded = loads(dumps(parse('λx.x x')))
+    assert loaded.body.fun is loaded.body.arg is loaded.args[0]
+
+
+def test_canonical():
+    e, e2 = parse('λab.a (λc.c b) z'), parse('λx.λy.x (λx.x y) z')
+    assert dumps(e) != dumps(e2) and dumps(e, canonical=True) == dumps(e2, canonical=True)
+    assert dumps(e, canonical=True) != dumps(parse('λab.b (λc.c b) z'), canonical=True)
+    loaded = loads(dumps(e2, canonical=True))
+    assert alpha_equiv(loaded, e2) and f'{loaded:terse}' == snapshot('λab.aλc.cbz')
+
+
+def test_buffers():
+    e, e2 = parse('(λx.x x)(λy.y)'), parse('λf.f f f')
+    data = dumps(e) + dumps(e2, canonical=True)
+    first, end = loads_from(data)
+    second, end = loads_from(memoryview(data), end)
+    assert (first, end) == (e, len(data)) and alpha_equiv(second, e2)
+    with mmap.mmap(-1, len(data)) as file:
+        file.write(data)
+        assert loads_from(file) == (e, len(dumps(e)))
+    with pytest.raises(ValueError):
+        loads(data)
+    with pytest.raises(ValueError):
+        loads(dumps(e)[:-1])
+    with pytest.raises(ValueError):
+        loads(b'\x09')
+    with pytest.raises(ValueError, match='unbound'):
+        loads(b'\x01\x00\x06')
+    with pytest.raises(ValueError, match='without arguments'):
+        loads(b'\x01\x01\x01x\x01\x0b')
+    with pytest.raises(ValueError, match='unknown name id 1'):
+        loads(b'\x01\x01\x01x\x07')
+    with pytest.raises(ValueError, match='unknown name id 2'):
+        loads(b'\x01\x01\x01x\x05\x02\x02')
+
+
+def test_deep_pickle():
+    deep = Var('x')
+    for _ in range(20_000):
+        deep = Fun([Var('y')], App(deep, Var('z')))
+    assert loads(dumps(deep)) == deep
+    data = pickle.dumps(deep)
+    assert len(data) < 100_000 and pickle.loads(data) == deep
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+from inline_snapshot import snapshot
+
+from lambda_calc.service import GradingService
+
+INITIAL = '(λx.x)(λz.yz)(z)'
+CANDIDATE = f'\n{INITIAL}\nb-> ((λz.yz)z)\nb-> (y z)\n'
+# searching several steps ahead in a term that only grows never ends
+OMEGA = '(λx.xxx)(λx.xxx)'
+STUCK = f'\n{OMEGA}\nb-> λz.z\n'
+
+
+def test_grading_service():
+    async def run():
+        async with GradingService(workers=2, deadline=0.5, queue_size=2) as service:
+            stuck = await service.submit(STUCK, OMEGA, max_steps=10 ** 6)
+            results = [await service.submit(CANDIDATE, INITIAL) for _ in range(6)]
+            assert service.metrics.max_queued <= 2
+            assert [await result for result in results] == [{'errors': []}] * 6
+            assert await stuck == {'error': 'deadline exceeded'}
+            # the killed worker was replaced
+            assert await service.check(f'\n{INITIAL}\nb-> ((λz.cz)z)\n', INITIAL) == snapshot(
+                {'errors': ['Line 2: Invalid beta reduction']})
+            responses = []
+            assert await service.handle('{"id": 3, "candidate": 1}', responses.append) is None
+            assert await service.handle('{"id": 4, "metrics": true}', responses.append) is None
+            return service.metrics, responses
+    metrics, responses = asyncio.run(run())
+    assert metrics[3:8] == snapshot((8, 1, 0, 1, 1))
+    assert responses[0] == snapshot({'id': 3, 'error': 'invalid request: candidate and initial must be strings'})
+    assert responses[1]['metrics']['timed_out'] == 1
+
+
+def test_time_limit():
+    async def run():
+        async with GradingService(workers=1, deadline=30, time_limit=0.3) as service:
+            stuck = await service.check(STUCK, OMEGA, max_steps=10 ** 6)
+            return stuck, await service.check(CANDIDATE, INITIAL), service.metrics
+    stuck, checked, metrics = asyncio.run(run())
+    assert stuck == snapshot({'errors': ['Line 2: Resource limit exceeded']})
+    assert checked == {'errors': []} and metrics.restarts == 0
+
+
+def test_serve_stdio():
+    requests = [{'id': i, 'candidate': CANDIDATE, 'initial': INITIAL} for i in range(3)]
+    requests.append({'id': 'stuck', 'candidate': STUCK, 'initial': OMEGA, 'max_steps': 10 ** 6})
+    lines = ''.join(json.dumps(request) + '\n' for request in requests) + 'not json\n'
+    output = subprocess.run([sys.executable, '-m', 'lambda_calc.service', '--workers', '2', '--deadline', '0.5'],
+                            input=lines, capture_output=True, text=True, timeout=60).stdout
+    responses = sorted((json.loads(line) for line in output.splitlines()), key=lambda response: str(response['id']))
+    assert responses == snapshot([{'id': 0, 'errors': []}, {'id': 1, 'errors': []}, {'id': 2, 'errors': []},
+                                  {'id': None, 'error': 'invalid request: Expecting value: line 1 column 1 (char 0)'},
+                                  {'id': 'stuck', 'error': 'deadline exceeded'}])
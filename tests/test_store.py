@@ -0,0 +1,39 @@
+from inline_snapshot import snapshot
+
+from lambda_calc.ast import App, from_debruijn, to_debruijn
+from lambda_calc.core import all_beta_reductions
+from lambda_calc.parser import parse
+from lambda_calc.store import TermStore
+
+
+def test_round_trip():
+    for text in ['x', 'λxy.x y z', 'λx.λx.x', "(λx'.x' y)(λa b c.c b a)", '(λf.λx.f(f x))(λf.λx.f(f x))']:
+        e = parse(text)
+        store = TermStore.from_expr(e)
+        assert store.to_expr() == e
+        assert store.to_debruijn() is to_debruijn(e)
+
+
+def test_counts():
+    store = TermStore.from_expr(parse('λq.(λx.λy.y x)(q q)((λz.z)w)'))
+    # variables are stored once for every index and free name
+    assert len(store) == snapshot(12)
+    assert (store.size(), store.depth()) == snapshot((15, 7))
+    assert (store.count_redexes(), store.count_free(), store.free_names()) == snapshot((2, 1, frozenset({'w'})))
+
+
+def test_beta(church):
+    # named apart, so all_beta_reductions does not need alpha steps
+    e = from_debruijn(to_debruijn(parse('(λx.x)((λy.λz.y z)(λa.z a))(λb.(λc.c)b)')))
+    store = TermStore.from_expr(e)
+    assert [store.beta(i).to_debruijn() for i in range(store.count_redexes())] == [
+        to_debruijn(reduced) for _, reduced in all_beta_reductions(e)]
+    # capturing names are replaced when converting back
+    assert f'{TermStore.from_expr(parse("(λx.λy.x y)(λz.z y)")).beta().to_expr():terse}' == snapshot('λa.(λb.by)a')
+
+    store = TermStore.from_expr(App(App(parse('λmnfx.m f(n f x)'), church(3)), church(4)))
+    while store.count_redexes():
+        store = store.beta()
+    assert store.to_debruijn() is to_debruijn(church(7))
+    # only the nodes of the normal form are left
+    assert len(store) == snapshot(11)